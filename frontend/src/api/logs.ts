@@ -12,6 +12,7 @@ export interface RequestLogQuery {
   page_size?: number
   cli_type?: string
   provider_name?: string
+  before_id?: number
 }
 
 export interface SystemLogQuery {
@@ -20,6 +21,7 @@ export interface SystemLogQuery {
   level?: string
   event_type?: string
   provider_name?: string
+  before_id?: number
 }
 
 export const logsApi = {
@@ -36,7 +38,8 @@ export const logsApi = {
     const data = await invoke<RequestLogListResponse>('get_request_logs', {
       page: params.page,
       pageSize: params.page_size,
-      cliType: params.cli_type
+      cliType: params.cli_type,
+      beforeId: params.before_id
     })
     return { data }
   },
@@ -55,7 +58,8 @@ export const logsApi = {
       pageSize: params.page_size,
       level: params.level,
       eventType: params.event_type,
-      providerName: params.provider_name
+      providerName: params.provider_name,
+      beforeId: params.before_id
     })
     return { data }
   },
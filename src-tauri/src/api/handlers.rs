@@ -9,7 +9,8 @@ use futures_util::StreamExt;
 use serde::{Deserialize, Serialize};
 use std::sync::Arc;
 use std::time::Instant;
-use tokio::sync::{mpsc, Mutex};
+use std::sync::Mutex;
+use tokio::sync::mpsc;
 use flate2::read::GzDecoder;
 use std::io::Read;
 
@@ -17,7 +18,7 @@ use super::AppState;
 use crate::db::models::{
     Provider, ProviderCreate, ProviderResponse, ProviderUpdate,
     GatewaySettings, TimeoutSettings, TimeoutSettingsUpdate,
-    RequestLogItem, RequestLogDetail, PaginatedLogs,
+    RequestLogItem, RequestLogDetail, RequestLogDetailRow, PaginatedLogs,
     SystemLogItem, SystemLogListResponse,
     DailyStats,
     SystemStatus,
@@ -28,8 +29,11 @@ use crate::services::proxy::{
     CliType, TimeoutConfig, TokenUsage,
 };
 use crate::services::routing::select_provider;
-use crate::services::{provider as provider_service, stats as stats_service};
-use crate::services::stats::RequestLogInfo;
+use crate::services::provider as provider_service;
+use crate::services::stats::{
+    cached_log_count, invalidate_log_count, log_detail_enabled, log_filter_clause, log_page_clause,
+    set_log_detail_enabled, RequestLogEntry, RequestLogInfo,
+};
 
 // Common query params
 #[derive(Debug, Deserialize)]
@@ -78,26 +82,31 @@ pub async fn proxy_handler_catchall(
     req: axum::http::Request<Body>,
 ) -> Result<Response<Body>, StatusCode> {
     let start_time = Instant::now();
-    let method = req.method().clone();
-    let headers = req.headers().clone();
-    let uri = req.uri().clone();
+    // Take the request apart instead of cloning method/headers/uri
+    let (parts, body) = req.into_parts();
+    let method = parts.method;
+    let headers = parts.headers;
+    let uri = parts.uri;
 
     // Get the full path including query string
-    let full_path = if let Some(query) = uri.query() {
-        format!("{}?{}", uri.path(), query)
-    } else {
-        uri.path().to_string()
-    };
+    let full_path = uri
+        .path_and_query()
+        .map(|pq| pq.as_str())
+        .unwrap_or_else(|| uri.path())
+        .to_string();
 
     // Detect CLI type from User-Agent
     let cli_type = detect_cli_type(&headers);
 
+    // 未开启请求日志记录（debug_log）时不采集请求头/请求体，省去序列化与复制
+    let log_detail = log_detail_enabled();
+
     // Serialize client headers for logging
-    let client_headers_json = serialize_headers(&headers);
+    let client_headers_json = log_detail.then(|| serialize_headers(&headers));
 
     // Read request body
-    let body_bytes = match axum::body::to_bytes(req.into_body(), 10 * 1024 * 1024).await {
-        Ok(bytes) => bytes.to_vec(),
+    let body_bytes = match axum::body::to_bytes(body, 10 * 1024 * 1024).await {
+        Ok(bytes) => bytes,
         Err(e) => {
             tracing::error!(error = %e, "Failed to read request body");
             return Err(StatusCode::BAD_REQUEST);
@@ -105,7 +114,7 @@ pub async fn proxy_handler_catchall(
     };
 
     // Store client body for logging (truncate if too large)
-    let client_body_str = truncate_body(&body_bytes);
+    let client_body_str = log_detail.then(|| truncate_body(&body_bytes));
 
     // Select provider based on CLI type
     let provider_with_maps = match select_provider(&state.db, cli_type.as_str()).await {
@@ -113,14 +122,13 @@ pub async fn proxy_handler_catchall(
         Ok(None) => {
             tracing::warn!(cli_type = %cli_type, "No available provider");
             // Log system event
-            let _ = stats_service::record_system_log(
-                &state.log_db,
+            state.log_writer.record_system(
                 "warn",
                 "no_provider_available",
                 &format!("No available provider for CLI type: {}", cli_type),
                 None,
                 None,
-            ).await;
+            );
             return Ok(Response::builder()
                 .status(StatusCode::SERVICE_UNAVAILABLE)
                 .header("content-type", "application/json")
@@ -159,7 +167,7 @@ pub async fn proxy_handler_catchall(
         }
         _ => {
             let mapping = apply_body_model_mapping(&provider_with_maps, &body_bytes, &full_path);
-            (mapping.body, mapping.path, mapping.source_model, mapping.target_model)
+            (Bytes::from(mapping.body), mapping.path, mapping.source_model, mapping.target_model)
         }
     };
 
@@ -184,11 +192,11 @@ pub async fn proxy_handler_catchall(
     }
 
     // Serialize forward headers for logging (mask sensitive headers)
-    let forward_headers_json = serialize_reqwest_headers(&req_headers);
-    let forward_body_str = truncate_body(&final_body);
+    let forward_headers_json = log_detail.then(|| serialize_headers(&req_headers));
+    let forward_body_str = log_detail.then(|| truncate_body(&final_body));
 
-    // Create HTTP client request
-    let client = reqwest::Client::new();
+    // Create HTTP client request (shared client, pooled connections)
+    let client = &state.http_client;
     let request_builder = match method.as_str() {
         "GET" => client.get(&upstream_url),
         "POST" => client.post(&upstream_url),
@@ -210,11 +218,11 @@ pub async fn proxy_handler_catchall(
 
     // Build log info
     let log_info = RequestLogInfo {
-        client_headers: Some(client_headers_json),
-        client_body: Some(client_body_str),
-        forward_url: Some(upstream_url.clone()),
-        forward_headers: Some(forward_headers_json),
-        forward_body: Some(forward_body_str),
+        client_headers: client_headers_json,
+        client_body: client_body_str,
+        forward_url: log_detail.then(|| upstream_url.clone()),
+        forward_headers: forward_headers_json,
+        forward_body: forward_body_str,
         ..Default::default()
     };
 
@@ -252,26 +260,35 @@ pub async fn proxy_handler_catchall(
     }
 }
 
+/// 将请求头直接序列化为 JSON 对象，不再先收集到临时 HashMap<String, String>
+/// （axum 与 reqwest 共用 http 1.x 的 HeaderMap；HeaderName 本身已是小写）
 fn serialize_headers(headers: &axum::http::HeaderMap) -> String {
-    let map: std::collections::HashMap<String, String> = headers
-        .iter()
-        .filter_map(|(k, v)| {
-            let key = k.as_str().to_lowercase();
-            v.to_str().ok().map(|v| (key, v.to_string()))
-        })
-        .collect();
-    serde_json::to_string(&map).unwrap_or_default()
-}
+    struct HeadersJson<'a>(&'a axum::http::HeaderMap);
+
+    impl Serialize for HeadersJson<'_> {
+        fn serialize<S: serde::Serializer>(&self, serializer: S) -> std::result::Result<S::Ok, S::Error> {
+            // 每个 header 名只输出一次：重复的 header（set-cookie、vary 等）用 ", " 合并，
+            // 避免生成带重复 key 的 JSON
+            serializer.collect_map(self.0.keys().filter_map(|k| {
+                let mut values = self.0.get_all(k).iter().filter_map(|v| v.to_str().ok());
+                let first = values.next()?;
+                let value: std::borrow::Cow<str> = match values.next() {
+                    None => first.into(),
+                    Some(second) => {
+                        let mut joined = format!("{}, {}", first, second);
+                        for v in values {
+                            joined.push_str(", ");
+                            joined.push_str(v);
+                        }
+                        joined.into()
+                    }
+                };
+                Some((k.as_str(), value))
+            }))
+        }
+    }
 
-fn serialize_reqwest_headers(headers: &reqwest::header::HeaderMap) -> String {
-    let map: std::collections::HashMap<String, String> = headers
-        .iter()
-        .filter_map(|(k, v)| {
-            let key = k.as_str().to_lowercase();
-            v.to_str().ok().map(|v| (key, v.to_string()))
-        })
-        .collect();
-    serde_json::to_string(&map).unwrap_or_default()
+    serde_json::to_string(&HeadersJson(headers)).unwrap_or_default()
 }
 
 fn truncate_body(body: &[u8]) -> String {
@@ -323,14 +340,13 @@ async fn handle_streaming_request(
             tracing::error!(error = %e, "Upstream request failed");
             if let Ok((was_blacklisted, prov_name)) = provider_service::record_failure(&state.db, provider_id).await {
                 if was_blacklisted {
-                    let _ = stats_service::record_system_log(
-                        &state.log_db,
+                    state.log_writer.record_system(
                         "warn",
                         "provider_blacklisted",
                         &format!("Provider {} blacklisted due to consecutive failures", prov_name),
                         Some(&prov_name),
                         Some(&format!("{{\"error\": \"{}\"}}", e)),
-                    ).await;
+                    );
                 }
             }
             log_info.error_message = Some(format!("Upstream error: {}", e));
@@ -346,8 +362,7 @@ async fn handle_streaming_request(
                 client_method,
                 client_path,
                 Some(log_info),
-            )
-            .await;
+            );
             return Ok(Response::builder()
                 .status(StatusCode::BAD_GATEWAY)
                 .header("content-type", "application/json")
@@ -358,14 +373,13 @@ async fn handle_streaming_request(
             tracing::error!("First byte timeout");
             if let Ok((was_blacklisted, prov_name)) = provider_service::record_failure(&state.db, provider_id).await {
                 if was_blacklisted {
-                    let _ = stats_service::record_system_log(
-                        &state.log_db,
+                    state.log_writer.record_system(
                         "warn",
                         "provider_blacklisted",
                         &format!("Provider {} blacklisted due to consecutive failures", prov_name),
                         Some(&prov_name),
                         Some("{\"error\": \"First byte timeout\"}"),
-                    ).await;
+                    );
                 }
             }
             log_info.error_message = Some("First byte timeout".to_string());
@@ -381,8 +395,7 @@ async fn handle_streaming_request(
                 client_method,
                 client_path,
                 Some(log_info),
-            )
-            .await;
+            );
             return Ok(Response::builder()
                 .status(StatusCode::GATEWAY_TIMEOUT)
                 .header("content-type", "application/json")
@@ -395,8 +408,11 @@ async fn handle_streaming_request(
     let resp_headers = response.headers().clone();
 
     // Store provider response info
-    log_info.provider_headers = Some(serialize_reqwest_headers(&resp_headers));
-    log_info.response_headers = Some(serialize_reqwest_headers(&resp_headers));
+    if log_detail_enabled() {
+        let resp_headers_json = serialize_headers(&resp_headers);
+        log_info.response_headers = Some(resp_headers_json.clone());
+        log_info.provider_headers = Some(resp_headers_json);
+    }
 
     // Build response headers
     let mut builder = Response::builder()
@@ -416,6 +432,7 @@ async fn handle_streaming_request(
 
     // 使用共享状态收集chunks，确保即使stream被提前终止也能记录日志
     // 优化：只存储原始chunks，后台任务再解析（避免重复解析）
+    // 锁只在 push / take 时短暂持有且不跨 await，用 std Mutex 避免异步锁的调度开销
     let collected_chunks = Arc::new(Mutex::new(Vec::<Bytes>::new()));
     let collected_chunks_for_stream = collected_chunks.clone();
     
@@ -438,9 +455,9 @@ async fn handle_streaming_request(
                     // 只收集chunk到共享状态（快速操作，减少锁持有时间）
                     // 限制总大小避免内存占用过大
                     if total_bytes <= 100 * 1024 {
-                        let mut chunks = collected_chunks_for_stream.lock().await;
-                        chunks.push(chunk.clone());
-                        drop(chunks);  // 立即释放锁
+                        if let Ok(mut chunks) = collected_chunks_for_stream.lock() {
+                            chunks.push(chunk.clone());
+                        }
                     }
                     
                     tracing::debug!(
@@ -502,12 +519,15 @@ async fn handle_streaming_request(
         let _ = stream_end_rx.recv().await;
         tracing::debug!("[{}] Received stream end notification", cli_type);
         
-        // 读取收集的chunks
-        let chunks = collected_chunks.lock().await.clone();
+        // 取走收集的chunks（stream 已结束，无需再复制一份）
+        let chunks = collected_chunks
+            .lock()
+            .map(|mut chunks| std::mem::take(&mut *chunks))
+            .unwrap_or_default();
         drop(collected_chunks);  // 立即释放Arc引用
         
-        // 一次性解析（避免重复解析，提升性能）
-        let full_body: Vec<u8> = chunks.iter().flat_map(|c| c.iter()).copied().collect();
+        // 一次性拼接（concat 预先按总长度分配，按块复制）
+        let full_body: Vec<u8> = chunks.concat();
         let chunk_count = chunks.len();
         
         tracing::info!(
@@ -541,38 +561,38 @@ async fn handle_streaming_request(
         );
         
         // Update log info with response body
-        let content_encoding = log_resp_headers.get("content-encoding")
-            .and_then(|v| v.to_str().ok());
-        let decompressed_body = maybe_decompress(&full_body, content_encoding);
         let mut final_log_info = log_info;
-        final_log_info.provider_body = Some(truncate_body(&decompressed_body));
-        final_log_info.response_body = final_log_info.provider_body.clone();
+        if log_detail_enabled() {
+            let content_encoding = log_resp_headers.get("content-encoding")
+                .and_then(|v| v.to_str().ok());
+            let decompressed_body = maybe_decompress(&full_body, content_encoding);
+            final_log_info.provider_body = Some(truncate_body(&decompressed_body));
+            final_log_info.response_body = final_log_info.provider_body.clone();
+        }
         
         // Record stats
         let elapsed = start_time.elapsed().as_millis() as i64;
         if log_is_success {
             if let Ok(had_failures) = provider_service::record_success(&log_state.db, log_provider_id).await {
                 if had_failures {
-                    let _ = stats_service::record_system_log(
-                        &log_state.log_db,
+                    log_state.log_writer.record_system(
                         "info",
                         "provider_recovered",
                         &format!("Provider {} recovered successfully", log_provider_name),
                         Some(&log_provider_name),
                         None,
-                    ).await;
+                    );
                 }
             }
         } else if let Ok((was_blacklisted, prov_name)) = provider_service::record_failure(&log_state.db, log_provider_id).await {
             if was_blacklisted {
-                let _ = stats_service::record_system_log(
-                    &log_state.log_db,
+                log_state.log_writer.record_system(
                     "warn",
                     "provider_blacklisted",
                     &format!("Provider {} blacklisted due to consecutive failures", prov_name),
                     Some(&prov_name),
                     final_log_info.error_message.as_deref(),
-                ).await;
+                );
             }
         }
         
@@ -588,7 +608,7 @@ async fn handle_streaming_request(
             &log_client_method,
             &log_client_path,
             Some(final_log_info),
-        ).await;
+        );
         
         tracing::info!("[{}] Delayed log recording completed", cli_type);
     });
@@ -623,14 +643,13 @@ async fn handle_non_streaming_request(
             tracing::error!(error = %e, "Upstream request failed");
             if let Ok((was_blacklisted, prov_name)) = provider_service::record_failure(&state.db, provider_id).await {
                 if was_blacklisted {
-                    let _ = stats_service::record_system_log(
-                        &state.log_db,
+                    state.log_writer.record_system(
                         "warn",
                         "provider_blacklisted",
                         &format!("Provider {} blacklisted due to consecutive failures", prov_name),
                         Some(&prov_name),
                         Some(&format!("{{\"error\": \"{}\"}}", e)),
-                    ).await;
+                    );
                 }
             }
             log_info.error_message = Some(format!("Upstream error: {}", e));
@@ -646,8 +665,7 @@ async fn handle_non_streaming_request(
                 client_method,
                 client_path,
                 Some(log_info),
-            )
-            .await;
+            );
             return Ok(Response::builder()
                 .status(StatusCode::BAD_GATEWAY)
                 .header("content-type", "application/json")
@@ -658,14 +676,13 @@ async fn handle_non_streaming_request(
             tracing::error!("Request timeout");
             if let Ok((was_blacklisted, prov_name)) = provider_service::record_failure(&state.db, provider_id).await {
                 if was_blacklisted {
-                    let _ = stats_service::record_system_log(
-                        &state.log_db,
+                    state.log_writer.record_system(
                         "warn",
                         "provider_blacklisted",
                         &format!("Provider {} blacklisted due to consecutive failures", prov_name),
                         Some(&prov_name),
                         Some("{\"error\": \"Request timeout\"}"),
-                    ).await;
+                    );
                 }
             }
             log_info.error_message = Some("Request timeout".to_string());
@@ -681,8 +698,7 @@ async fn handle_non_streaming_request(
                 client_method,
                 client_path,
                 Some(log_info),
-            )
-            .await;
+            );
             return Ok(Response::builder()
                 .status(StatusCode::GATEWAY_TIMEOUT)
                 .header("content-type", "application/json")
@@ -696,8 +712,11 @@ async fn handle_non_streaming_request(
     let is_success = status.is_success();
 
     // Store provider response info
-    log_info.provider_headers = Some(serialize_reqwest_headers(&resp_headers));
-    log_info.response_headers = Some(serialize_reqwest_headers(&resp_headers));
+    if log_detail_enabled() {
+        let resp_headers_json = serialize_headers(&resp_headers);
+        log_info.response_headers = Some(resp_headers_json.clone());
+        log_info.provider_headers = Some(resp_headers_json);
+    }
 
     // Read response body
     let body_bytes = match response.bytes().await {
@@ -706,14 +725,13 @@ async fn handle_non_streaming_request(
             tracing::error!(error = %e, "Failed to read response body");
             if let Ok((was_blacklisted, prov_name)) = provider_service::record_failure(&state.db, provider_id).await {
                 if was_blacklisted {
-                    let _ = stats_service::record_system_log(
-                        &state.log_db,
+                    state.log_writer.record_system(
                         "warn",
                         "provider_blacklisted",
                         &format!("Provider {} blacklisted due to consecutive failures", prov_name),
                         Some(&prov_name),
                         Some(&format!("{{\"error\": \"{}\"}}", e)),
-                    ).await;
+                    );
                 }
             }
             log_info.error_message = Some(format!("Failed to read response body: {}", e));
@@ -729,8 +747,7 @@ async fn handle_non_streaming_request(
                 client_method,
                 client_path,
                 Some(log_info),
-            )
-            .await;
+            );
             return Err(StatusCode::BAD_GATEWAY);
         }
     };
@@ -741,8 +758,10 @@ async fn handle_non_streaming_request(
     let decompressed_body = maybe_decompress(&body_bytes, content_encoding);
 
     // Store response body for logging (use decompressed version)
-    log_info.provider_body = Some(truncate_body(&decompressed_body));
-    log_info.response_body = log_info.provider_body.clone();
+    if log_detail_enabled() {
+        log_info.provider_body = Some(truncate_body(&decompressed_body));
+        log_info.response_body = log_info.provider_body.clone();
+    }
 
     // Parse token usage (use decompressed body)
     let mut usage = TokenUsage::default();
@@ -752,26 +771,24 @@ async fn handle_non_streaming_request(
     if is_success {
         if let Ok(had_failures) = provider_service::record_success(&state.db, provider_id).await {
             if had_failures {
-                let _ = stats_service::record_system_log(
-                    &state.log_db,
+                state.log_writer.record_system(
                     "info",
                     "provider_recovered",
                     &format!("Provider {} recovered successfully", provider_name),
                     Some(provider_name),
                     None,
-                ).await;
+                );
             }
         }
     } else if let Ok((was_blacklisted, prov_name)) = provider_service::record_failure(&state.db, provider_id).await {
         if was_blacklisted {
-            let _ = stats_service::record_system_log(
-                &state.log_db,
+            state.log_writer.record_system(
                 "warn",
                 "provider_blacklisted",
                 &format!("Provider {} blacklisted due to consecutive failures", prov_name),
                 Some(&prov_name),
                 log_info.error_message.as_deref(),
-            ).await;
+            );
         }
     }
 
@@ -789,8 +806,7 @@ async fn handle_non_streaming_request(
         client_method,
         client_path,
         Some(log_info),
-    )
-    .await;
+    );
 
     // Build response
     let mut builder = Response::builder()
@@ -808,7 +824,7 @@ async fn handle_non_streaming_request(
     Ok(builder.body(Body::from(body_bytes)).unwrap())
 }
 
-async fn record_request_stats(
+fn record_request_stats(
     state: &Arc<AppState>,
     cli_type: CliType,
     provider_name: &str,
@@ -821,35 +837,20 @@ async fn record_request_stats(
     client_path: &str,
     log_info: Option<RequestLogInfo>,
 ) {
-    // Derive success from status_code (200-299 = success)
-    let success = status_code.map(|code| (200..300).contains(&code)).unwrap_or(false);
-
-    // Record to request_logs
-    let _ = stats_service::record_request_log(
-        &state.log_db,
-        cli_type.as_str(),
-        provider_name,
-        model_id,
+    // Queued to request_logs + usage_daily by the background log writer
+    state.log_writer.record(RequestLogEntry {
+        created_at: chrono::Utc::now().timestamp(),
+        cli_type: cli_type.as_str().to_string(),
+        provider_name: provider_name.to_string(),
+        model_id: model_id.map(|m| m.to_string()),
         status_code,
         elapsed_ms,
         input_tokens,
         output_tokens,
-        client_method,
-        client_path,
-        log_info,
-    )
-    .await;
-
-    // Record to usage_daily
-    let _ = stats_service::record_request(
-        &state.log_db,
-        provider_name,
-        cli_type.as_str(),
-        success,
-        input_tokens,
-        output_tokens,
-    )
-    .await;
+        client_method: client_method.to_string(),
+        client_path: client_path.to_string(),
+        info: log_info.unwrap_or_default(),
+    });
 }
 
 // Providers
@@ -870,8 +871,15 @@ pub async fn list_providers(
             .await
     };
 
+    let now = chrono::Utc::now().timestamp();
     providers
-        .map(|ps| Json(ps.into_iter().map(ProviderResponse::from).collect()))
+        .map(|ps| {
+            Json(
+                ps.into_iter()
+                    .map(|p| ProviderResponse::from_provider(p, now))
+                    .collect(),
+            )
+        })
         .map_err(db_error)
 }
 
@@ -896,10 +904,11 @@ pub async fn create_provider_handler(
     let now = chrono::Utc::now().timestamp();
     let cli_type = input.cli_type.unwrap_or_else(|| "claude_code".to_string());
 
-    let result = sqlx::query(
+    let provider = sqlx::query_as::<_, Provider>(
         r#"
         INSERT INTO providers (cli_type, name, base_url, api_key, enabled, failure_threshold, blacklist_minutes, consecutive_failures, sort_order, created_at, updated_at)
         VALUES (?, ?, ?, ?, ?, ?, ?, 0, (SELECT COALESCE(MAX(sort_order), 0) + 1 FROM providers), ?, ?)
+        RETURNING *
         "#,
     )
     .bind(&cli_type)
@@ -911,12 +920,12 @@ pub async fn create_provider_handler(
     .bind(input.blacklist_minutes.unwrap_or(10))
     .bind(now)
     .bind(now)
-    .execute(&state.db)
+    .fetch_one(&state.db)
     .await
     .map_err(db_error)?;
 
-    let id = result.last_insert_rowid();
-    get_provider_handler(State(state), Path(id)).await
+    crate::services::routing::invalidate_cache();
+    Ok(Json(ProviderResponse::from(provider)))
 }
 
 pub async fn update_provider_handler(
@@ -957,8 +966,8 @@ pub async fn update_provider_handler(
         return get_provider_handler(State(state), Path(id)).await;
     }
 
-    let query = format!("UPDATE providers SET {} WHERE id = ?", updates.join(", "));
-    let mut q = sqlx::query(&query).bind(now);
+    let query = format!("UPDATE providers SET {} WHERE id = ? RETURNING *", updates.join(", "));
+    let mut q = sqlx::query_as::<_, Provider>(&query).bind(now);
 
     if let Some(ref name) = input.name {
         q = q.bind(name);
@@ -979,12 +988,15 @@ pub async fn update_provider_handler(
         q = q.bind(blacklist_minutes);
     }
 
-    q.bind(id)
-        .execute(&state.db)
+    let provider = q
+        .bind(id)
+        .fetch_optional(&state.db)
         .await
-        .map_err(db_error)?;
+        .map_err(db_error)?
+        .ok_or_else(|| error_response("Provider not found"))?;
+    crate::services::routing::invalidate_cache();
 
-    get_provider_handler(State(state), Path(id)).await
+    Ok(Json(ProviderResponse::from(provider)))
 }
 
 pub async fn delete_provider_handler(
@@ -996,6 +1008,7 @@ pub async fn delete_provider_handler(
         .execute(&state.db)
         .await
         .map_err(db_error)?;
+    crate::services::routing::invalidate_cache();
     Ok(StatusCode::NO_CONTENT)
 }
 
@@ -1003,14 +1016,9 @@ pub async fn reorder_providers_handler(
     State(state): State<Arc<AppState>>,
     Json(ids): Json<Vec<i64>>,
 ) -> Result<StatusCode, (StatusCode, Json<ErrorResponse>)> {
-    for (idx, id) in ids.iter().enumerate() {
-        sqlx::query("UPDATE providers SET sort_order = ? WHERE id = ?")
-            .bind(idx as i64)
-            .bind(id)
-            .execute(&state.db)
-            .await
-            .map_err(db_error)?;
-    }
+    provider_service::reorder_providers(&state.db, &ids)
+        .await
+        .map_err(db_error)?;
     Ok(StatusCode::NO_CONTENT)
 }
 
@@ -1023,6 +1031,7 @@ pub async fn reset_provider_failures_handler(
         .execute(&state.db)
         .await
         .map_err(db_error)?;
+    crate::services::routing::invalidate_cache();
     Ok(StatusCode::NO_CONTENT)
 }
 
@@ -1061,6 +1070,7 @@ pub async fn update_gateway_settings_handler(
         .execute(&state.db)
         .await
         .map_err(db_error)?;
+    set_log_detail_enabled(input.debug_log);
     Ok(StatusCode::NO_CONTENT)
 }
 
@@ -1104,6 +1114,8 @@ pub struct LogQuery {
     #[serde(default = "default_page_size")]
     page_size: i64,
     cli_type: Option<String>,
+    /// 上一页最后一条日志的 id，提供时按主键 seek 代替 OFFSET
+    before_id: Option<i64>,
 }
 
 pub async fn get_request_logs(
@@ -1115,41 +1127,29 @@ pub async fn get_request_logs(
     let offset = (page - 1) * page_size;
     let pool = &state.log_db;
 
-    let (items, total) = if let Some(ct) = query.cli_type {
-        let items = sqlx::query_as::<_, RequestLogItem>(
-            "SELECT id, created_at, cli_type, provider_name, model_id, status_code, elapsed_ms, input_tokens, output_tokens, client_method, client_path FROM request_logs WHERE cli_type = ? ORDER BY id DESC LIMIT ? OFFSET ?",
-        )
-        .bind(&ct)
-        .bind(page_size)
-        .bind(offset)
-        .fetch_all(pool)
-        .await
-        .map_err(db_error)?;
-
-        let total: (i64,) = sqlx::query_as("SELECT COUNT(*) FROM request_logs WHERE cli_type = ?")
-            .bind(&ct)
-            .fetch_one(pool)
-            .await
-            .map_err(db_error)?;
+    let (filter_sql, filter_values) = log_filter_clause(&[("cli_type", query.cli_type.as_deref())]);
+    let sql = format!(
+        "SELECT id, created_at, cli_type, provider_name, model_id, status_code, elapsed_ms, input_tokens, output_tokens, client_method, client_path FROM request_logs WHERE 1=1{}{}",
+        filter_sql,
+        log_page_clause(query.before_id)
+    );
 
-        (items, total.0)
+    let mut q = sqlx::query_as::<_, RequestLogItem>(&sql);
+    for value in &filter_values {
+        q = q.bind(*value);
+    }
+    if let Some(id) = query.before_id {
+        q = q.bind(id).bind(page_size);
     } else {
-        let items = sqlx::query_as::<_, RequestLogItem>(
-            "SELECT id, created_at, cli_type, provider_name, model_id, status_code, elapsed_ms, input_tokens, output_tokens, client_method, client_path FROM request_logs ORDER BY id DESC LIMIT ? OFFSET ?",
-        )
-        .bind(page_size)
-        .bind(offset)
-        .fetch_all(pool)
-        .await
-        .map_err(db_error)?;
-
-        let total: (i64,) = sqlx::query_as("SELECT COUNT(*) FROM request_logs")
-            .fetch_one(pool)
-            .await
-            .map_err(db_error)?;
+        q = q.bind(page_size).bind(offset);
+    }
 
-        (items, total.0)
-    };
+    // 分页查询与总数互不依赖，并发执行（日志库为 WAL，读之间不阻塞）；总数短时缓存
+    let (items, total) = tokio::try_join!(
+        q.fetch_all(pool),
+        cached_log_count(pool, "request_logs", &filter_sql, &filter_values)
+    )
+    .map_err(db_error)?;
 
     Ok(Json(PaginatedLogs {
         items,
@@ -1166,6 +1166,7 @@ pub async fn clear_request_logs(
         .execute(&state.log_db)
         .await
         .map_err(db_error)?;
+    invalidate_log_count("request_logs");
     Ok(StatusCode::NO_CONTENT)
 }
 
@@ -1173,14 +1174,14 @@ pub async fn get_request_log_detail(
     State(state): State<Arc<AppState>>,
     Path(id): Path<i64>,
 ) -> Result<Json<RequestLogDetail>, (StatusCode, Json<ErrorResponse>)> {
-    sqlx::query_as::<_, RequestLogDetail>(
+    sqlx::query_as::<_, RequestLogDetailRow>(
         "SELECT id, created_at, cli_type, provider_name, model_id, status_code, elapsed_ms, input_tokens, output_tokens, client_method, client_path, client_headers, client_body, forward_url, forward_headers, forward_body, provider_headers, provider_body, response_headers, response_body, error_message FROM request_logs WHERE id = ?",
     )
     .bind(id)
     .fetch_optional(&state.log_db)
     .await
     .map_err(db_error)?
-    .map(Json)
+    .map(|row| Json(RequestLogDetail::from(row)))
     .ok_or_else(|| error_response("Log not found"))
 }
 
@@ -1194,6 +1195,8 @@ pub struct SystemLogQuery {
     pub level: Option<String>,
     pub event_type: Option<String>,
     pub provider_name: Option<String>,
+    /// 上一页最后一条日志的 id，提供时按主键 seek 代替 OFFSET
+    pub before_id: Option<i64>,
 }
 
 pub async fn get_system_logs_handler(
@@ -1205,52 +1208,35 @@ pub async fn get_system_logs_handler(
     let offset = (page - 1) * page_size;
     let pool = &state.log_db;
 
-    // Build query
-    let mut sql = "SELECT * FROM system_logs WHERE 1=1".to_string();
-    let mut count_sql = "SELECT COUNT(*) FROM system_logs WHERE 1=1".to_string();
-
-    if query.level.is_some() {
-        sql.push_str(" AND level = ?");
-        count_sql.push_str(" AND level = ?");
-    }
-    if query.event_type.is_some() {
-        sql.push_str(" AND event_type = ?");
-        count_sql.push_str(" AND event_type = ?");
-    }
-    if query.provider_name.is_some() {
-        sql.push_str(" AND provider_name = ?");
-        count_sql.push_str(" AND provider_name = ?");
-    }
-
-    sql.push_str(" ORDER BY id DESC LIMIT ? OFFSET ?");
-    let mut q = sqlx::query_as::<_, SystemLogItem>(&sql)
-        .bind(page_size)
-        .bind(offset);
-
-    if let Some(ref lvl) = query.level {
-        q = q.bind(lvl);
-    }
-    if let Some(ref et) = query.event_type {
-        q = q.bind(et);
+    // Build query：过滤条件只构建一次，列表与 COUNT 共用
+    let (filter_sql, filter_values) = log_filter_clause(&[
+        ("level", query.level.as_deref()),
+        ("event_type", query.event_type.as_deref()),
+        ("provider_name", query.provider_name.as_deref()),
+    ]);
+    let sql = format!(
+        "SELECT id, created_at, level, event_type, provider_name, message, details FROM system_logs WHERE 1=1{}{}",
+        filter_sql,
+        log_page_clause(query.before_id)
+    );
+
+    // 过滤条件的占位符在 LIMIT/OFFSET 之前，需先绑定
+    let mut q = sqlx::query_as::<_, SystemLogItem>(&sql);
+    for value in &filter_values {
+        q = q.bind(*value);
     }
-    if let Some(ref pn) = query.provider_name {
-        q = q.bind(pn);
+    if let Some(id) = query.before_id {
+        q = q.bind(id).bind(page_size);
+    } else {
+        q = q.bind(page_size).bind(offset);
     }
 
-    let items = q.fetch_all(pool).await.map_err(db_error)?;
-
-    // Get total count
-    let mut count_q = sqlx::query_as::<_, (i64,)>(&count_sql);
-    if let Some(ref lvl) = query.level {
-        count_q = count_q.bind(lvl);
-    }
-    if let Some(ref et) = query.event_type {
-        count_q = count_q.bind(et);
-    }
-    if let Some(ref pn) = query.provider_name {
-        count_q = count_q.bind(pn);
-    }
-    let (total,) = count_q.fetch_one(pool).await.map_err(db_error)?;
+    // 分页查询与总数互不依赖，并发执行（日志库为 WAL，读之间不阻塞）；总数短时缓存
+    let (items, total) = tokio::try_join!(
+        q.fetch_all(pool),
+        cached_log_count(pool, "system_logs", &filter_sql, &filter_values)
+    )
+    .map_err(db_error)?;
 
     Ok(Json(SystemLogListResponse {
         items,
@@ -1267,6 +1253,7 @@ pub async fn clear_system_logs_handler(
         .execute(&state.log_db)
         .await
         .map_err(db_error)?;
+    invalidate_log_count("system_logs");
     Ok(StatusCode::NO_CONTENT)
 }
 
@@ -1284,7 +1271,7 @@ pub async fn get_daily_stats(
 ) -> Result<Json<Vec<DailyStats>>, (StatusCode, Json<ErrorResponse>)> {
     let pool = &state.log_db;
 
-    let mut sql = "SELECT * FROM usage_daily WHERE 1=1".to_string();
+    let mut sql = "SELECT usage_date, provider_name, cli_type, request_count, success_count, failure_count, input_tokens, output_tokens FROM usage_daily WHERE 1=1".to_string();
     if query.start_date.is_some() {
         sql.push_str(" AND usage_date >= ?");
     }
@@ -1329,7 +1316,15 @@ pub async fn get_system_status_handler(
 pub struct AllSettingsResponse {
     pub gateway: GatewaySettingsResponse,
     pub timeouts: TimeoutSettings,
-    pub cli_settings: std::collections::HashMap<String, crate::db::models::CliSettingsResponse>,
+    pub cli_settings: CliSettingsBundle,
+}
+
+/// CLI 类型固定为三种，用定长结构代替 HashMap，序列化结果相同
+#[derive(Debug, Serialize)]
+pub struct CliSettingsBundle {
+    pub claude_code: crate::db::models::CliSettingsResponse,
+    pub codex: crate::db::models::CliSettingsResponse,
+    pub gemini: crate::db::models::CliSettingsResponse,
 }
 
 pub async fn get_all_settings(
@@ -1348,17 +1343,16 @@ pub async fn get_all_settings(
         .map_err(db_error)?;
 
     // Get CLI settings
-    let mut cli_settings = std::collections::HashMap::new();
-    for cli_type in &["claude_code", "codex", "gemini"] {
-        cli_settings.insert(
-            cli_type.to_string(),
-            crate::db::models::CliSettingsResponse {
-                cli_type: cli_type.to_string(),
-                enabled: false, // TODO: Check if config file exists
-                default_json_config: String::new(),
-            },
-        );
-    }
+    let cli_default = |cli_type: &str| crate::db::models::CliSettingsResponse {
+        cli_type: cli_type.to_string(),
+        enabled: false, // TODO: Check if config file exists
+        default_json_config: String::new(),
+    };
+    let cli_settings = CliSettingsBundle {
+        claude_code: cli_default("claude_code"),
+        codex: cli_default("codex"),
+        gemini: cli_default("gemini"),
+    };
 
     Ok(Json(AllSettingsResponse {
         gateway: GatewaySettingsResponse {
@@ -6,12 +6,15 @@ use axum::{
 };
 use sqlx::SqlitePool;
 use std::sync::Arc;
+use crate::services::stats::LogWriter;
 use tower_http::cors::{Any, CorsLayer};
 
 #[derive(Clone)]
 pub struct AppState {
     pub db: SqlitePool,
     pub log_db: SqlitePool,
+    pub log_writer: LogWriter,
+    pub http_client: reqwest::Client,
 }
 
 pub fn create_router(state: AppState) -> Router {
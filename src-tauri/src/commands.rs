@@ -1,9 +1,9 @@
-use crate::config::get_data_dir;
+use crate::config::{get_data_dir, get_home_dir};
 use crate::db::models::{
-    Provider, ProviderCreate, ProviderResponse, ProviderUpdate,
+    Provider, ProviderCreate, ProviderResponse, ProviderUpdate, ModelMapInput, ModelMapResponse,
     GatewaySettings, TimeoutSettings, TimeoutSettingsUpdate,
     CliSettingsRow, CliSettingsResponse, CliSettingsUpdate,
-    RequestLogItem, RequestLogDetail, PaginatedLogs,
+    RequestLogItem, RequestLogDetail, RequestLogDetailRow, PaginatedLogs,
     SystemLogItem, SystemLogListResponse,
     DailyStats, ProviderStatsRow, ProviderStatsResponse,
     McpConfig, McpCliFlag, McpResponse, McpCreate, McpUpdate,
@@ -12,58 +12,95 @@ use crate::db::models::{
     ProjectInfo, SessionInfo, PaginatedProjects, PaginatedSessions, SessionMessage,
     SystemStatus,
 };
+use crate::services::stats::{cached_log_count, invalidate_log_count, log_filter_clause, log_page_clause};
 use crate::LogDb;
 use sqlx::SqlitePool;
 use tauri::State;
 
 type Result<T> = std::result::Result<T, String>;
 
+/// 受管理的 CLI 类型（MCP / Prompt 状态与同步均按此顺序遍历）
+const CLI_TYPES: [&str; 3] = ["claude_code", "codex", "gemini"];
+
+/// 判断 CLI 配置是否指向本网关时匹配的地址片段
+const GATEWAY_ADDR_NEEDLES: [&str; 2] = ["127.0.0.1:7788", "localhost:7788"];
+
+/// 写入 CLI 配置的网关地址与占位凭据
+const GATEWAY_BASE_URL: &str = "http://127.0.0.1:7788";
+const GATEWAY_TOKEN: &str = "ccg-gateway";
+/// Gemini .env 内容固定不变，直接作为静态字面量写入（与上面的地址、凭据保持一致）
+const GEMINI_ENV_CONTENT: &str = "GEMINI_API_KEY=ccg-gateway\nGOOGLE_GEMINI_BASE_URL=http://127.0.0.1:7788\n";
+
+fn points_to_gateway(url: &str) -> bool {
+    GATEWAY_ADDR_NEEDLES.iter().any(|needle| url.contains(needle))
+}
+
 #[tauri::command]
 pub async fn get_providers(
     db: State<'_, SqlitePool>,
     cli_type: Option<String>,
 ) -> Result<Vec<ProviderResponse>> {
-    let providers = if let Some(ct) = cli_type {
-        sqlx::query_as::<_, Provider>(
+    // 两条查询：providers 一条，model maps 一次取回后按 provider_id 分组（避免 N+1）
+    let (providers, maps) = if let Some(ct) = cli_type {
+        let providers = sqlx::query_as::<_, Provider>(
             "SELECT * FROM providers WHERE cli_type = ? ORDER BY sort_order, id",
         )
         .bind(&ct)
         .fetch_all(db.inner())
         .await
+        .map_err(|e| e.to_string())?;
+
+        let maps: Vec<(i64, i64, String, String, bool)> = sqlx::query_as(
+            "SELECT m.id, m.provider_id, m.source_model, m.target_model, m.enabled FROM provider_model_map m JOIN providers p ON p.id = m.provider_id WHERE p.cli_type = ? ORDER BY m.id",
+        )
+        .bind(&ct)
+        .fetch_all(db.inner())
+        .await
+        .map_err(|e| e.to_string())?;
+
+        (providers, maps)
     } else {
-        sqlx::query_as::<_, Provider>("SELECT * FROM providers ORDER BY sort_order, id")
+        let providers = sqlx::query_as::<_, Provider>("SELECT * FROM providers ORDER BY sort_order, id")
             .fetch_all(db.inner())
             .await
-    };
-
-    let providers = providers.map_err(|e| e.to_string())?;
-    let mut results = Vec::new();
-
-    for provider in providers {
-        let mut response = ProviderResponse::from(provider.clone());
+            .map_err(|e| e.to_string())?;
 
-        // Load model maps
-        let maps: Vec<(i64, String, String, i64)> = sqlx::query_as(
-            "SELECT id, source_model, target_model, enabled FROM provider_model_map WHERE provider_id = ? ORDER BY id",
+        let maps: Vec<(i64, i64, String, String, bool)> = sqlx::query_as(
+            "SELECT id, provider_id, source_model, target_model, enabled FROM provider_model_map ORDER BY id",
         )
-        .bind(provider.id)
         .fetch_all(db.inner())
         .await
         .map_err(|e| e.to_string())?;
 
-        response.model_maps = maps
-            .into_iter()
-            .map(|(id, source_model, target_model, enabled)| crate::db::models::ModelMapResponse {
+        (providers, maps)
+    };
+
+    let mut maps_by_provider: std::collections::HashMap<i64, Vec<crate::db::models::ModelMapResponse>> =
+        std::collections::HashMap::new();
+    for (id, provider_id, source_model, target_model, enabled) in maps {
+        maps_by_provider
+            .entry(provider_id)
+            .or_default()
+            .push(crate::db::models::ModelMapResponse {
                 id,
                 source_model,
                 target_model,
-                enabled: enabled != 0,
-            })
-            .collect();
-
-        results.push(response);
+                enabled,
+            });
     }
 
+    let now = chrono::Utc::now().timestamp();
+    let results = providers
+        .into_iter()
+        .map(|provider| {
+            let model_maps = maps_by_provider.remove(&provider.id).unwrap_or_default();
+            // 直接移动行数据构造响应，不再逐行 clone
+            let mut response = ProviderResponse::from_provider(provider, now);
+            response.model_maps = model_maps;
+            response
+        })
+        .collect();
+
     Ok(results)
 }
 
@@ -77,27 +114,30 @@ pub async fn get_provider(db: State<'_, SqlitePool>, id: i64) -> Result<Provider
         .ok_or_else(|| "Provider not found".to_string())?;
 
     let mut response = ProviderResponse::from(provider);
+    response.model_maps = load_model_maps(db.inner(), id).await?;
+    Ok(response)
+}
 
-    // Load model maps
-    let maps: Vec<(i64, String, String, i64)> = sqlx::query_as(
+/// Load model maps of a provider, ordered by id
+async fn load_model_maps(db: &SqlitePool, provider_id: i64) -> Result<Vec<ModelMapResponse>> {
+    let maps: Vec<(i64, String, String, bool)> = sqlx::query_as(
         "SELECT id, source_model, target_model, enabled FROM provider_model_map WHERE provider_id = ? ORDER BY id",
     )
-    .bind(id)
-    .fetch_all(db.inner())
+    .bind(provider_id)
+    .fetch_all(db)
     .await
     .map_err(|e| e.to_string())?;
 
-    response.model_maps = maps
-        .into_iter()
-        .map(|(id, source_model, target_model, enabled)| crate::db::models::ModelMapResponse {
-            id,
-            source_model,
-            target_model,
-            enabled: enabled != 0,
-        })
-        .collect();
+    Ok(maps.into_iter().map(model_map_response).collect())
+}
 
-    Ok(response)
+fn model_map_response((id, source_model, target_model, enabled): (i64, String, String, bool)) -> ModelMapResponse {
+    ModelMapResponse {
+        id,
+        source_model,
+        target_model,
+        enabled,
+    }
 }
 
 #[tauri::command]
@@ -110,10 +150,15 @@ pub async fn create_provider(
     let cli_type = input.cli_type.unwrap_or_else(|| "claude_code".to_string());
     let provider_name = input.name.clone();
 
-    let result = sqlx::query(
+    // provider 与模型映射在同一事务中写入：一次提交，且不会留下缺少映射的 provider
+    let mut tx = db.begin().await.map_err(|e| e.to_string())?;
+
+    // RETURNING * 直接取回新行，返回结果时无需再查一次
+    let provider = sqlx::query_as::<_, Provider>(
         r#"
         INSERT INTO providers (cli_type, name, base_url, api_key, enabled, failure_threshold, blacklist_minutes, consecutive_failures, sort_order, created_at, updated_at)
         VALUES (?, ?, ?, ?, ?, ?, ?, 0, (SELECT COALESCE(MAX(sort_order), 0) + 1 FROM providers), ?, ?)
+        RETURNING *
         "#,
     )
     .bind(&cli_type)
@@ -125,27 +170,19 @@ pub async fn create_provider(
     .bind(input.blacklist_minutes.unwrap_or(10))
     .bind(now)
     .bind(now)
-    .execute(db.inner())
+    .fetch_one(&mut *tx)
     .await
     .map_err(|e| e.to_string())?;
 
-    let id = result.last_insert_rowid();
-
     // Insert model maps if provided
-    if let Some(model_maps) = input.model_maps {
-        for map in model_maps {
-            sqlx::query(
-                "INSERT INTO provider_model_map (provider_id, source_model, target_model, enabled) VALUES (?, ?, ?, ?)",
-            )
-            .bind(id)
-            .bind(&map.source_model)
-            .bind(&map.target_model)
-            .bind(map.enabled as i64)
-            .execute(db.inner())
-            .await
-            .map_err(|e| e.to_string())?;
-        }
-    }
+    let model_maps = match input.model_maps {
+        Some(model_maps) => insert_model_maps(&mut tx, provider.id, &model_maps).await?,
+        None => Vec::new(),
+    };
+
+    tx.commit().await.map_err(|e| e.to_string())?;
+
+    crate::services::routing::invalidate_cache();
 
     // Log system event
     let _ = crate::services::stats::record_system_log(
@@ -157,7 +194,39 @@ pub async fn create_provider(
         None,
     ).await;
 
-    get_provider(db, id).await
+    let mut response = ProviderResponse::from(provider);
+    response.model_maps = model_maps;
+    Ok(response)
+}
+
+/// 用一条多行 INSERT 写入 provider 的全部模型映射，RETURNING 取回新映射（含 id）
+async fn insert_model_maps(
+    conn: &mut sqlx::SqliteConnection,
+    provider_id: i64,
+    model_maps: &[ModelMapInput],
+) -> Result<Vec<ModelMapResponse>> {
+    if model_maps.is_empty() {
+        return Ok(Vec::new());
+    }
+
+    let mut insert: sqlx::QueryBuilder<sqlx::Sqlite> = sqlx::QueryBuilder::new(
+        "INSERT INTO provider_model_map (provider_id, source_model, target_model, enabled) ",
+    );
+    insert.push_values(model_maps, |mut row, map| {
+        row.push_bind(provider_id)
+            .push_bind(map.source_model.as_str())
+            .push_bind(map.target_model.as_str())
+            .push_bind(map.enabled as i64);
+    });
+    insert.push(" RETURNING id, source_model, target_model, enabled");
+    let mut maps: Vec<(i64, String, String, bool)> = insert
+        .build_query_as()
+        .fetch_all(conn)
+        .await
+        .map_err(|e| e.to_string())?;
+    // RETURNING 的行序不保证，与 load_model_maps 一样按 id 排序
+    maps.sort_unstable_by_key(|m| m.0);
+    Ok(maps.into_iter().map(model_map_response).collect())
 }
 
 #[tauri::command]
@@ -169,16 +238,17 @@ pub async fn update_provider(
 ) -> Result<ProviderResponse> {
     let now = chrono::Utc::now().timestamp();
 
-    // Get provider name for logging
-    let provider_name: Option<(String,)> = sqlx::query_as(
-        "SELECT name FROM providers WHERE id = ?",
-    )
-    .bind(id)
-    .fetch_optional(db.inner())
-    .await
-    .map_err(|e| e.to_string())?;
+    // Current row: provider name for logging, and the response when nothing else changes
+    let existing: Option<Provider> = sqlx::query_as("SELECT * FROM providers WHERE id = ?")
+        .bind(id)
+        .fetch_optional(db.inner())
+        .await
+        .map_err(|e| e.to_string())?;
 
-    let provider_name = provider_name.map(|(n,)| n).unwrap_or_else(|| format!("Provider#{}", id));
+    let provider_name = existing
+        .as_ref()
+        .map(|p| p.name.clone())
+        .unwrap_or_else(|| format!("Provider#{}", id));
 
     // Check if model maps will be updated (before moving)
     let has_model_maps_update = input.model_maps.is_some();
@@ -212,9 +282,10 @@ pub async fn update_provider(
         has_updates = true;
     }
 
+    let mut provider = existing;
     if has_updates {
-        let query = format!("UPDATE providers SET {} WHERE id = ?", updates.join(", "));
-        let mut q = sqlx::query(&query).bind(now);
+        let query = format!("UPDATE providers SET {} WHERE id = ? RETURNING *", updates.join(", "));
+        let mut q = sqlx::query_as::<_, Provider>(&query).bind(now);
 
         if let Some(ref name) = input.name {
             q = q.bind(name);
@@ -235,34 +306,33 @@ pub async fn update_provider(
             q = q.bind(blacklist_minutes);
         }
 
-        q.bind(id)
-            .execute(db.inner())
+        provider = q
+            .bind(id)
+            .fetch_optional(db.inner())
             .await
             .map_err(|e| e.to_string())?;
     }
 
     // Update model maps if provided
+    let mut updated_maps = None;
     if let Some(model_maps) = input.model_maps {
+        let mut tx = db.begin().await.map_err(|e| e.to_string())?;
+
         // Delete existing maps
         sqlx::query("DELETE FROM provider_model_map WHERE provider_id = ?")
             .bind(id)
-            .execute(db.inner())
+            .execute(&mut *tx)
             .await
             .map_err(|e| e.to_string())?;
 
         // Insert new maps
-        for map in model_maps {
-            sqlx::query(
-                "INSERT INTO provider_model_map (provider_id, source_model, target_model, enabled) VALUES (?, ?, ?, ?)",
-            )
-            .bind(id)
-            .bind(&map.source_model)
-            .bind(&map.target_model)
-            .bind(map.enabled as i64)
-            .execute(db.inner())
-            .await
-            .map_err(|e| e.to_string())?;
-        }
+        updated_maps = Some(insert_model_maps(&mut tx, id, &model_maps).await?);
+
+        tx.commit().await.map_err(|e| e.to_string())?;
+    }
+
+    if has_updates || has_model_maps_update {
+        crate::services::routing::invalidate_cache();
     }
 
     // Log system event (only if there were actual updates)
@@ -277,7 +347,14 @@ pub async fn update_provider(
         ).await;
     }
 
-    get_provider(db, id).await
+    // 用已写入的行构造返回值，不再重新查询 provider
+    let provider = provider.ok_or_else(|| "Provider not found".to_string())?;
+    let mut response = ProviderResponse::from(provider);
+    response.model_maps = match updated_maps {
+        Some(maps) => maps,
+        None => load_model_maps(db.inner(), id).await?,
+    };
+    Ok(response)
 }
 
 #[tauri::command]
@@ -311,6 +388,8 @@ pub async fn delete_provider(
         .await
         .map_err(|e| e.to_string())?;
 
+    crate::services::routing::invalidate_cache();
+
     // Log system event
     let _ = crate::services::stats::record_system_log(
         &log_db.0,
@@ -326,15 +405,9 @@ pub async fn delete_provider(
 
 #[tauri::command]
 pub async fn reorder_providers(db: State<'_, SqlitePool>, ids: Vec<i64>) -> Result<()> {
-    for (idx, id) in ids.iter().enumerate() {
-        sqlx::query("UPDATE providers SET sort_order = ? WHERE id = ?")
-            .bind(idx as i64)
-            .bind(id)
-            .execute(db.inner())
-            .await
-            .map_err(|e| e.to_string())?;
-    }
-    Ok(())
+    crate::services::provider::reorder_providers(db.inner(), &ids)
+        .await
+        .map_err(|e| e.to_string())
 }
 
 #[tauri::command]
@@ -360,6 +433,8 @@ pub async fn reset_provider_failures(
         .await
         .map_err(|e| e.to_string())?;
 
+    crate::services::routing::invalidate_cache();
+
     // Log system event
     let _ = crate::services::stats::record_system_log(
         &log_db.0,
@@ -391,6 +466,7 @@ pub async fn update_gateway_settings(db: State<'_, SqlitePool>, debug_log: bool)
         .execute(db.inner())
         .await
         .map_err(|e| e.to_string())?;
+    crate::services::stats::set_log_detail_enabled(debug_log);
     Ok(())
 }
 
@@ -504,7 +580,7 @@ pub async fn update_cli_settings(
         .map_err(|e| e.to_string())?;
 
         let default_config = row.and_then(|r| r.default_json_config).unwrap_or_default();
-        sync_cli_config(&cli_type, enabled, &default_config, db).await?;
+        sync_cli_config(&cli_type, enabled, default_config).await?;
     }
 
     Ok(())
@@ -521,76 +597,77 @@ fn normalize_text(text: &str) -> String {
 
 // Check if MCP config exists in the CLI config file
 fn mcp_enabled_in_file(cli_type: &str, mcp_name: &str) -> bool {
-    let home = match dirs::home_dir() {
-        Some(h) => h,
-        None => return false,
+    mcp_names_in_file(cli_type).contains(mcp_name)
+}
+
+/// CLI 配置中 MCP 名称集合的缓存：按路径记录 (mtime, size, 名称集合)
+type McpNamesCache = std::sync::Mutex<
+    std::collections::HashMap<
+        std::path::PathBuf,
+        (std::time::SystemTime, u64, std::sync::Arc<std::collections::HashSet<String>>),
+    >,
+>;
+
+/// 读取 CLI 配置中已配置的 MCP 名称；文件未变化时复用上次解析结果
+/// （.claude.json 可能很大，MCP 列表每项都要判断三个 CLI，避免重复解析）
+fn mcp_names_in_file(cli_type: &str) -> std::sync::Arc<std::collections::HashSet<String>> {
+    static CACHE: std::sync::OnceLock<McpNamesCache> = std::sync::OnceLock::new();
+    let cache = CACHE.get_or_init(Default::default);
+
+    let Some(path) = get_mcp_config_path(cli_type) else {
+        return Default::default();
     };
 
-    match cli_type {
-        "claude_code" => {
-            let path = home.join(".claude.json");
-            if !path.exists() {
-                return false;
-            }
-            let content = match std::fs::read_to_string(&path) {
-                Ok(c) => c,
-                Err(_) => return false,
-            };
-            match serde_json::from_str::<serde_json::Value>(&content) {
-                Ok(config) => {
-                    config.get("mcpServers")
-                        .and_then(|v| v.as_object())
-                        .map(|servers| servers.contains_key(mcp_name))
-                        .unwrap_or(false)
-                }
-                Err(_) => false,
-            }
+    let Some((mtime, size)) = std::fs::metadata(&path)
+        .ok()
+        .and_then(|meta| Some((meta.modified().ok()?, meta.len())))
+    else {
+        cache.lock().unwrap().remove(&path);
+        return Default::default();
+    };
+
+    if let Some((cached_mtime, cached_size, names)) = cache.lock().unwrap().get(&path) {
+        if *cached_mtime == mtime && *cached_size == size {
+            return names.clone();
         }
-        "gemini" => {
-            let path = home.join(".gemini").join("settings.json");
-            if !path.exists() {
-                return false;
-            }
-            let content = match std::fs::read_to_string(&path) {
-                Ok(c) => c,
-                Err(_) => return false,
-            };
-            match serde_json::from_str::<serde_json::Value>(&content) {
-                Ok(config) => {
-                    config.get("mcpServers")
-                        .and_then(|v| v.as_object())
-                        .map(|servers| servers.contains_key(mcp_name))
-                        .unwrap_or(false)
-                }
-                Err(_) => false,
-            }
+    }
+
+    let names = std::sync::Arc::new(parse_mcp_names(cli_type, &path));
+    cache.lock().unwrap().insert(path, (mtime, size, names.clone()));
+    names
+}
+
+fn parse_mcp_names(cli_type: &str, path: &std::path::Path) -> std::collections::HashSet<String> {
+    if cli_type == "codex" {
+        let Ok(content) = std::fs::read_to_string(path) else {
+            return Default::default();
+        };
+        match content.parse::<toml_edit::DocumentMut>() {
+            Ok(doc) => doc
+                .get("mcp_servers")
+                .and_then(|v| v.as_table())
+                .map(|servers| servers.iter().map(|(name, _)| name.to_string()).collect())
+                .unwrap_or_default(),
+            Err(_) => Default::default(),
         }
-        "codex" => {
-            let path = home.join(".codex").join("config.toml");
-            if !path.exists() {
-                return false;
-            }
-            let content = match std::fs::read_to_string(&path) {
-                Ok(c) => c,
-                Err(_) => return false,
-            };
-            match content.parse::<toml_edit::DocumentMut>() {
-                Ok(doc) => {
-                    doc.get("mcp_servers")
-                        .and_then(|v| v.as_table())
-                        .map(|servers| servers.contains_key(mcp_name))
-                        .unwrap_or(false)
-                }
-                Err(_) => false,
-            }
+    } else {
+        let Ok(content) = std::fs::read(path) else {
+            return Default::default();
+        };
+        match serde_json::from_slice::<serde_json::Value>(&content) {
+            Ok(config) => config
+                .get("mcpServers")
+                .and_then(|v| v.as_object())
+                .map(|servers| servers.keys().cloned().collect())
+                .unwrap_or_default(),
+            Err(_) => Default::default(),
         }
-        _ => false,
     }
 }
 
 // Check if prompt content matches the file content
 fn prompt_enabled_in_file(cli_type: &str, prompt_content: &str) -> bool {
-    let home = match dirs::home_dir() {
+    let home = match get_home_dir() {
         Some(h) => h,
         None => return false,
     };
@@ -602,10 +679,7 @@ fn prompt_enabled_in_file(cli_type: &str, prompt_content: &str) -> bool {
         _ => return false,
     };
 
-    if !prompt_path.exists() {
-        return false;
-    }
-
+    // 文件不存在时读取即失败，无需先单独 stat
     let file_content = match std::fs::read_to_string(&prompt_path) {
         Ok(c) => c,
         Err(_) => return false,
@@ -624,100 +698,130 @@ fn check_cli_enabled(cli_type: &str) -> bool {
     }
 }
 
-fn check_claude_uses_gateway() -> bool {
-    let Some(home) = dirs::home_dir() else {
+/// 配置文件状态检查结果缓存：按路径记录 (mtime, size, 结果)
+type FileCheckCache = std::sync::Mutex<std::collections::HashMap<std::path::PathBuf, (std::time::SystemTime, u64, bool)>>;
+
+/// 文件 mtime 与大小均未变化时直接返回上次的检查结果，跳过读取与解析
+/// 文件不存在或无法 stat 时视为 false
+fn cached_file_check(path: &std::path::Path, check: impl FnOnce(&std::path::Path) -> bool) -> bool {
+    static CACHE: std::sync::OnceLock<FileCheckCache> = std::sync::OnceLock::new();
+    let cache = CACHE.get_or_init(Default::default);
+
+    let Some((mtime, size)) = std::fs::metadata(path)
+        .ok()
+        .and_then(|meta| Some((meta.modified().ok()?, meta.len())))
+    else {
+        cache.lock().unwrap().remove(path);
         return false;
     };
-    let config_path = home.join(".claude").join("settings.json");
 
-    if !config_path.exists() {
-        return false;
+    if let Some(&(cached_mtime, cached_size, result)) = cache.lock().unwrap().get(path) {
+        if cached_mtime == mtime && cached_size == size {
+            return result;
+        }
     }
 
-    let content = match std::fs::read_to_string(&config_path) {
-        Ok(c) => c,
-        Err(_) => return false,
-    };
+    let result = check(path);
+    cache.lock().unwrap().insert(path.to_path_buf(), (mtime, size, result));
+    result
+}
 
-    let content_trimmed = content.trim();
-    if content_trimmed.is_empty() || content_trimmed == "{}" {
+fn check_claude_uses_gateway() -> bool {
+    let Some(home) = get_home_dir() else {
         return false;
-    }
+    };
+    let config_path = home.join(".claude").join("settings.json");
+
+    cached_file_check(&config_path, |path| {
+        let content = match std::fs::read_to_string(path) {
+            Ok(c) => c,
+            Err(_) => return false,
+        };
+
+        let content_trimmed = content.trim();
+        if content_trimmed.is_empty() || content_trimmed == "{}" {
+            return false;
+        }
 
-    match serde_json::from_str::<serde_json::Value>(content_trimmed) {
-        Ok(data) => {
-            if let Some(env) = data.get("env") {
-                if let Some(base_url) = env.get("ANTHROPIC_BASE_URL").and_then(|v| v.as_str()) {
-                    return base_url.contains("127.0.0.1:7788") || base_url.contains("localhost:7788");
+        match serde_json::from_str::<serde_json::Value>(content_trimmed) {
+            Ok(data) => {
+                if let Some(env) = data.get("env") {
+                    if let Some(base_url) = env.get("ANTHROPIC_BASE_URL").and_then(|v| v.as_str()) {
+                        return points_to_gateway(base_url);
+                    }
                 }
+                false
             }
-            false
+            Err(_) => false,
         }
-        Err(_) => false,
-    }
+    })
 }
 
 fn check_codex_uses_gateway() -> bool {
-    let Some(home) = dirs::home_dir() else {
+    let Some(home) = get_home_dir() else {
         return false;
     };
     let config_path = home.join(".codex").join("config.toml");
 
-    if !config_path.exists() {
-        return false;
-    }
-
-    let content = match std::fs::read_to_string(&config_path) {
-        Ok(c) => c,
-        Err(_) => return false,
-    };
+    cached_file_check(&config_path, |path| {
+        let content = match std::fs::read_to_string(path) {
+            Ok(c) => c,
+            Err(_) => return false,
+        };
 
-    if content.trim().is_empty() {
-        return false;
-    }
+        if content.trim().is_empty() {
+            return false;
+        }
 
-    match content.parse::<toml_edit::DocumentMut>() {
-        Ok(doc) => {
-            // Check if model_provider is "ccg-gateway"
-            if let Some(provider) = doc.get("model_provider").and_then(|v| v.as_str()) {
-                if provider == "ccg-gateway" {
-                    return true;
+        match content.parse::<toml_edit::DocumentMut>() {
+            Ok(doc) => {
+                // Check if model_provider is "ccg-gateway"
+                if let Some(provider) = doc.get("model_provider").and_then(|v| v.as_str()) {
+                    if provider == "ccg-gateway" {
+                        return true;
+                    }
                 }
+                false
             }
-            false
+            Err(_) => false,
         }
-        Err(_) => false,
-    }
+    })
 }
 
 fn check_gemini_uses_gateway() -> bool {
-    let Some(home) = dirs::home_dir() else {
+    let Some(home) = get_home_dir() else {
         return false;
     };
     let env_path = home.join(".gemini").join(".env");
 
-    if !env_path.exists() {
-        return false;
-    }
-
-    let content = match std::fs::read_to_string(&env_path) {
-        Ok(c) => c,
-        Err(_) => return false,
-    };
-
-    // Check if .env contains GOOGLE_GEMINI_BASE_URL pointing to gateway
-    for line in content.lines() {
-        if line.starts_with("GOOGLE_GEMINI_BASE_URL=") {
-            let url = line.split('=').nth(1).unwrap_or("");
-            return url.contains("127.0.0.1:7788") || url.contains("localhost:7788");
+    cached_file_check(&env_path, |path| {
+        use std::io::BufRead;
+
+        let file = match std::fs::File::open(path) {
+            Ok(f) => f,
+            Err(_) => return false,
+        };
+
+        // Check if .env contains GOOGLE_GEMINI_BASE_URL pointing to gateway
+        // 按字节逐行扫描并复用缓冲区，命中第一条即返回；只有命中行才做 UTF-8 解码
+        let mut reader = std::io::BufReader::new(file);
+        let mut line = Vec::new();
+        loop {
+            line.clear();
+            match reader.read_until(b'\n', &mut line) {
+                Ok(0) | Err(_) => return false,
+                Ok(_) => {}
+            }
+            if let Some(url) = line.strip_prefix(b"GOOGLE_GEMINI_BASE_URL=") {
+                return points_to_gateway(&String::from_utf8_lossy(url));
+            }
         }
-    }
-    false
+    })
 }
 
 // Get the config file path for MCP/prompts sync (different for Codex)
 fn get_mcp_config_path(cli_type: &str) -> Option<std::path::PathBuf> {
-    let home = dirs::home_dir()?;
+    let home = get_home_dir()?;
     match cli_type {
         "claude_code" => Some(home.join(".claude.json")),  // Claude Code MCP goes to ~/.claude.json
         "codex" => Some(home.join(".codex").join("config.toml")),  // Codex MCP goes to config.toml
@@ -726,13 +830,98 @@ fn get_mcp_config_path(cli_type: &str) -> Option<std::path::PathBuf> {
     }
 }
 
-async fn sync_cli_config(cli_type: &str, enabled: bool, default_config: &str, db: State<'_, SqlitePool>) -> Result<()> {
-    match cli_type {
-        "claude_code" => sync_claude_code_config(enabled, default_config, db).await,
-        "codex" => sync_codex_config(enabled, default_config, db).await,
-        "gemini" => sync_gemini_config(enabled, default_config, db).await,
-        _ => Err("Invalid CLI type".to_string()),
+/// 配置文件读写、合并均为阻塞操作，放到 blocking 线程池执行，不占用异步运行时的工作线程
+async fn sync_cli_config(cli_type: &str, enabled: bool, default_config: String) -> Result<()> {
+    let sync: fn(bool, &str) -> Result<()> = match cli_type {
+        "claude_code" => sync_claude_code_config,
+        "codex" => sync_codex_config,
+        "gemini" => sync_gemini_config,
+        _ => return Err("Invalid CLI type".to_string()),
+    };
+    tokio::task::spawn_blocking(move || sync(enabled, &default_config))
+        .await
+        .map_err(|e| e.to_string())?
+}
+
+/// 记录错误日志并转换为命令错误，统一各配置文件操作的 "Failed to ..." 日志
+fn log_failure<E: std::fmt::Display>(action: &'static str) -> impl FnOnce(E) -> String {
+    move |e| {
+        tracing::error!("Failed to {}: {}", action, e);
+        e.to_string()
+    }
+}
+
+/// 内容与现有文件一致时跳过写入，避免无谓写盘并触发 CLI 的配置重载
+/// 先比较文件大小，大小不同时无需读取原文件
+fn write_if_changed(path: &std::path::Path, contents: impl AsRef<[u8]>) -> std::io::Result<()> {
+    let contents = contents.as_ref();
+    let unchanged = std::fs::metadata(path)
+        .map(|meta| meta.len() == contents.len() as u64)
+        .unwrap_or(false)
+        && std::fs::read(path).map(|current| current == contents).unwrap_or(false);
+    if unchanged {
+        return Ok(());
+    }
+    write_atomic(path, contents)
+}
+
+/// 同一配置文件的进程内互斥锁：MCP 开关、删除与 CLI 配置同步都是「读取-修改-写回」，
+/// 并发命令同时改同一文件（如 Gemini settings.json）时后写者会覆盖先写者的修改
+fn config_file_lock(path: &std::path::Path) -> std::sync::Arc<std::sync::Mutex<()>> {
+    type LockMap = std::sync::Mutex<std::collections::HashMap<std::path::PathBuf, std::sync::Arc<std::sync::Mutex<()>>>>;
+    static LOCKS: std::sync::OnceLock<LockMap> = std::sync::OnceLock::new();
+    LOCKS
+        .get_or_init(Default::default)
+        .lock()
+        .unwrap_or_else(|e| e.into_inner())
+        .entry(path.to_path_buf())
+        .or_default()
+        .clone()
+}
+
+/// 先写入同目录临时文件再 rename 覆盖，写到一半崩溃也不会留下截断的配置
+/// rename 失败时（如 Windows 上目标文件被占用）退回直接写入
+fn write_atomic(path: &std::path::Path, contents: impl AsRef<[u8]>) -> std::io::Result<()> {
+    let contents = contents.as_ref();
+    // 符号链接（如 dotfiles 管理）写到其指向的文件，避免 rename 把链接替换成普通文件
+    let resolved;
+    let path = match std::fs::symlink_metadata(path) {
+        Ok(meta) if meta.file_type().is_symlink() => {
+            resolved = std::fs::canonicalize(path)?;
+            resolved.as_path()
+        }
+        _ => path,
+    };
+    let Some(file_name) = path.file_name() else {
+        return std::fs::write(path, contents);
+    };
+    // 临时文件名带上 pid 与计数器，避免多个写入方（含其他进程）互相覆盖临时文件
+    static TMP_COUNTER: std::sync::atomic::AtomicU64 = std::sync::atomic::AtomicU64::new(0);
+    let seq = TMP_COUNTER.fetch_add(1, std::sync::atomic::Ordering::Relaxed);
+    let mut tmp_name = file_name.to_os_string();
+    tmp_name.push(format!(".ccg-tmp.{}.{}", std::process::id(), seq));
+    let tmp_path = path.with_file_name(tmp_name);
+
+    // 保留原文件权限：~/.claude.json 等可能是 0600 且含 token，不能在 rename 后变成 umask 默认权限
+    // 先设置权限再写入内容，临时文件不会有内容可读而权限过宽的窗口
+    let permissions = std::fs::metadata(path).ok().map(|meta| meta.permissions());
+    let written = (|| {
+        use std::io::Write;
+        let mut file = std::fs::File::create(&tmp_path)?;
+        if let Some(permissions) = permissions {
+            file.set_permissions(permissions)?;
+        }
+        file.write_all(contents)
+    })();
+    if let Err(e) = written {
+        let _ = std::fs::remove_file(&tmp_path);
+        return Err(e);
     }
+    if std::fs::rename(&tmp_path, path).is_err() {
+        let _ = std::fs::remove_file(&tmp_path);
+        return std::fs::write(path, contents);
+    }
+    Ok(())
 }
 
 fn get_backup_path(original_path: &std::path::Path) -> std::path::PathBuf {
@@ -740,11 +929,22 @@ fn get_backup_path(original_path: &std::path::Path) -> std::path::PathBuf {
     original_path.parent().unwrap().join(format!("{}.ccg-backup", file_name))
 }
 
-fn backup_file(path: &std::path::Path) -> Result<()> {
-    if !path.exists() {
+/// 读取目录下的文件名集合，一次 read_dir 代替对同目录文件逐个 stat；目录不存在时为空
+fn dir_entry_names(dir: &std::path::Path) -> std::collections::HashSet<std::ffi::OsString> {
+    std::fs::read_dir(dir)
+        .map(|entries| entries.filter_map(|e| e.ok()).map(|e| e.file_name()).collect())
+        .unwrap_or_default()
+}
+
+/// 原配置存在且尚未备份时才备份（names 为所在目录的文件名集合）
+fn backup_file(names: &std::collections::HashSet<std::ffi::OsString>, path: &std::path::Path) -> Result<()> {
+    let backup_path = get_backup_path(path);
+    let (Some(file_name), Some(backup_name)) = (path.file_name(), backup_path.file_name()) else {
+        return Ok(());
+    };
+    if !names.contains(file_name) || names.contains(backup_name) {
         return Ok(());
     }
-    let backup_path = get_backup_path(path);
     std::fs::copy(path, &backup_path).map_err(|e| {
         tracing::error!("Failed to backup {}: {}", path.display(), e);
         e.to_string()
@@ -754,72 +954,87 @@ fn backup_file(path: &std::path::Path) -> Result<()> {
 
 fn restore_backup(path: &std::path::Path) -> Result<bool> {
     let backup_path = get_backup_path(path);
-    if !backup_path.exists() {
-        return Ok(false);
+    // 直接 rename 覆盖原文件：单次系统调用且原子，无需 copy + remove
+    match std::fs::rename(&backup_path, path) {
+        Ok(()) => Ok(true),
+        Err(e) if e.kind() == std::io::ErrorKind::NotFound => Ok(false),
+        Err(e) => {
+            tracing::error!("Failed to restore backup from {}: {}", backup_path.display(), e);
+            Err(e.to_string())
+        }
+    }
+}
+
+/// 读取文件，不存在时返回 None：直接 open 探测，省去先 exists() 再读取的额外 stat
+fn read_if_exists(path: &std::path::Path) -> std::io::Result<Option<Vec<u8>>> {
+    match std::fs::read(path) {
+        Ok(content) => Ok(Some(content)),
+        Err(e) if e.kind() == std::io::ErrorKind::NotFound => Ok(None),
+        Err(e) => Err(e),
     }
-    std::fs::copy(&backup_path, path).map_err(|e| {
-        tracing::error!("Failed to restore backup from {}: {}", backup_path.display(), e);
-        e.to_string()
-    })?;
-    std::fs::remove_file(&backup_path).map_err(|e| {
-        tracing::warn!("Failed to remove backup file {}: {}", backup_path.display(), e);
-        e.to_string()
-    })?;
-    Ok(true)
 }
 
-fn has_backup(path: &std::path::Path) -> bool {
-    get_backup_path(path).exists()
+/// 删除文件，文件不存在视为成功：一次 unlink 代替 exists() + remove_file 的两次系统调用
+fn remove_if_exists(path: &std::path::Path) -> std::io::Result<()> {
+    match std::fs::remove_file(path) {
+        Err(e) if e.kind() != std::io::ErrorKind::NotFound => Err(e),
+        _ => Ok(()),
+    }
 }
 
-fn deep_merge(base: &mut serde_json::Value, override_val: &serde_json::Value) {
-    if let (Some(base_obj), Some(override_obj)) = (base.as_object_mut(), override_val.as_object()) {
+/// 自定义配置为空或只有 "{}" 时无需解析（大多数用户的默认值）
+fn is_blank_config(config: &str) -> bool {
+    let config = config.trim();
+    config.is_empty() || config == "{}"
+}
+
+/// 将 override_val 深度合并进 base；按值接收覆盖配置，叶子节点直接移动而非逐个 clone
+fn deep_merge(base: &mut serde_json::Value, override_val: serde_json::Value) {
+    if let (Some(base_obj), serde_json::Value::Object(override_obj)) = (base.as_object_mut(), override_val) {
         for (key, value) in override_obj {
-            if let Some(base_value) = base_obj.get_mut(key) {
-                if base_value.is_object() && value.is_object() {
+            match base_obj.get_mut(&key) {
+                Some(base_value) if base_value.is_object() && value.is_object() => {
                     deep_merge(base_value, value);
-                } else {
-                    *base_value = value.clone();
                 }
-            } else {
-                base_obj.insert(key.clone(), value.clone());
+                Some(base_value) => *base_value = value,
+                None => {
+                    base_obj.insert(key, value);
+                }
             }
         }
     }
 }
 
 // Sync Claude Code configuration (settings.json)
-async fn sync_claude_code_config(enabled: bool, default_config: &str, _db: State<'_, SqlitePool>) -> Result<()> {
-    let home = dirs::home_dir().ok_or_else(|| "Cannot get home directory".to_string())?;
+fn sync_claude_code_config(enabled: bool, default_config: &str) -> Result<()> {
+    let home = get_home_dir().ok_or_else(|| "Cannot get home directory".to_string())?;
     let config_path = home.join(".claude").join("settings.json");
+    let lock = config_file_lock(&config_path);
+    let _guard = lock.lock().unwrap_or_else(|e| e.into_inner());
 
     if enabled {
         // Backup existing config if not already backed up
-        if config_path.exists() && !has_backup(&config_path) {
-            backup_file(&config_path)?;
-        }
+        let names = dir_entry_names(&home.join(".claude"));
+        backup_file(&names, &config_path)?;
 
         // Create config directory if it doesn't exist
         if let Some(parent) = config_path.parent() {
-            std::fs::create_dir_all(parent).map_err(|e| {
-                tracing::error!("Failed to create directory: {}", e);
-                e.to_string()
-            })?;
+            std::fs::create_dir_all(parent).map_err(log_failure("create directory"))?;
         }
 
         // Build base config with gateway address
         let mut config = serde_json::json!({
             "env": {
-                "ANTHROPIC_BASE_URL": "http://127.0.0.1:7788",
-                "ANTHROPIC_AUTH_TOKEN": "ccg-gateway"
+                "ANTHROPIC_BASE_URL": GATEWAY_BASE_URL,
+                "ANTHROPIC_AUTH_TOKEN": GATEWAY_TOKEN
             }
         });
 
         // Merge user's custom config if provided
-        if !default_config.is_empty() {
+        if !is_blank_config(default_config) {
             match serde_json::from_str::<serde_json::Value>(default_config) {
                 Ok(custom_config) => {
-                    deep_merge(&mut config, &custom_config);
+                    deep_merge(&mut config, custom_config);
                 }
                 Err(e) => {
                     tracing::warn!("Failed to parse custom config (invalid JSON): {}", e);
@@ -828,82 +1043,68 @@ async fn sync_claude_code_config(enabled: bool, default_config: &str, _db: State
         }
 
         // Write config file
-        let config_str = serde_json::to_string_pretty(&config).map_err(|e| {
-            tracing::error!("Failed to serialize config: {}", e);
-            e.to_string()
-        })?;
-        std::fs::write(&config_path, config_str).map_err(|e| {
-            tracing::error!("Failed to write config file: {}", e);
-            e.to_string()
-        })?;
+        let config_bytes = serde_json::to_vec_pretty(&config).map_err(log_failure("serialize config"))?;
+        write_if_changed(&config_path, config_bytes).map_err(log_failure("write config file"))?;
     } else {
         // When disabling, restore backup or remove config file
-        if restore_backup(&config_path)? {
-        } else if config_path.exists() {
+        if !restore_backup(&config_path)? {
             // No backup, remove the config file
-            std::fs::remove_file(&config_path).map_err(|e| {
-                tracing::error!("Failed to remove config file: {}", e);
-                e.to_string()
-            })?;
+            remove_if_exists(&config_path).map_err(log_failure("remove config file"))?;
         }
     }
 
     Ok(())
 }
 
+/// 指向网关的 config.toml 基础模板，首次使用时构建一次，之后每次同步只 clone
+fn codex_base_config() -> &'static toml_edit::DocumentMut {
+    static TEMPLATE: std::sync::OnceLock<toml_edit::DocumentMut> = std::sync::OnceLock::new();
+    TEMPLATE.get_or_init(|| {
+        let mut doc = toml_edit::DocumentMut::new();
+        doc["model_provider"] = toml_edit::value(GATEWAY_TOKEN);
+        doc["model_providers"] = toml_edit::table();
+
+        let mut gateway_table = toml_edit::Table::new();
+        gateway_table.insert("name", toml_edit::value(GATEWAY_TOKEN));
+        gateway_table.insert("base_url", toml_edit::value(GATEWAY_BASE_URL));
+        gateway_table.insert("wire_api", toml_edit::value("responses"));
+        gateway_table.insert("requires_openai_auth", toml_edit::value(false));
+
+        doc["model_providers"][GATEWAY_TOKEN] = toml_edit::Item::Table(gateway_table);
+        doc
+    })
+}
+
 // Sync Codex configuration (auth.json + config.toml)
-async fn sync_codex_config(enabled: bool, default_config: &str, _db: State<'_, SqlitePool>) -> Result<()> {
-    let home = dirs::home_dir().ok_or_else(|| "Cannot get home directory".to_string())?;
+fn sync_codex_config(enabled: bool, default_config: &str) -> Result<()> {
+    let home = get_home_dir().ok_or_else(|| "Cannot get home directory".to_string())?;
     let codex_dir = home.join(".codex");
     let auth_path = codex_dir.join("auth.json");
     let config_path = codex_dir.join("config.toml");
+    let lock = config_file_lock(&config_path);
+    let _guard = lock.lock().unwrap_or_else(|e| e.into_inner());
 
     if enabled {
         // Backup existing configs if not already backed up
-        if auth_path.exists() && !has_backup(&auth_path) {
-            backup_file(&auth_path)?;
-        }
-        if config_path.exists() && !has_backup(&config_path) {
-            backup_file(&config_path)?;
-        }
+        let names = dir_entry_names(&codex_dir);
+        backup_file(&names, &auth_path)?;
+        backup_file(&names, &config_path)?;
 
         // Create config directory if it doesn't exist
-        std::fs::create_dir_all(&codex_dir).map_err(|e| {
-            tracing::error!("Failed to create Codex directory: {}", e);
-            e.to_string()
-        })?;
+        std::fs::create_dir_all(&codex_dir).map_err(log_failure("create Codex directory"))?;
 
         // Write auth.json with gateway API key
         let auth = serde_json::json!({
-            "OPENAI_API_KEY": "ccg-gateway"
+            "OPENAI_API_KEY": GATEWAY_TOKEN
         });
-        let auth_str = serde_json::to_string_pretty(&auth).map_err(|e| {
-            tracing::error!("Failed to serialize auth.json: {}", e);
-            e.to_string()
-        })?;
-        std::fs::write(&auth_path, auth_str).map_err(|e| {
-            tracing::error!("Failed to write auth.json: {}", e);
-            e.to_string()
-        })?;
+        let auth_bytes = serde_json::to_vec_pretty(&auth).map_err(log_failure("serialize auth.json"))?;
+        write_if_changed(&auth_path, auth_bytes).map_err(log_failure("write auth.json"))?;
 
         // Build base config.toml pointing to gateway
-        let mut doc = toml_edit::DocumentMut::new();
-        doc["model_provider"] = toml_edit::value("ccg-gateway");
-
-        if !doc.contains_table("model_providers") {
-            doc["model_providers"] = toml_edit::table();
-        }
-
-        let mut gateway_table = toml_edit::Table::new();
-        gateway_table.insert("name", toml_edit::value("ccg-gateway"));
-        gateway_table.insert("base_url", toml_edit::value("http://127.0.0.1:7788"));
-        gateway_table.insert("wire_api", toml_edit::value("responses"));
-        gateway_table.insert("requires_openai_auth", toml_edit::value(false));
-
-        doc["model_providers"]["ccg-gateway"] = toml_edit::Item::Table(gateway_table);
+        let mut doc = codex_base_config().clone();
 
         // Merge user's custom config if provided (TOML format)
-        if !default_config.is_empty() {
+        if !is_blank_config(default_config) {
             match default_config.parse::<toml_edit::DocumentMut>() {
                 Ok(custom_doc) => {
                     // Merge custom config into base config
@@ -919,29 +1120,18 @@ async fn sync_codex_config(enabled: bool, default_config: &str, _db: State<'_, S
             }
         }
 
-        std::fs::write(&config_path, doc.to_string()).map_err(|e| {
-            tracing::error!("Failed to write config.toml: {}", e);
-            e.to_string()
-        })?;
+        write_if_changed(&config_path, doc.to_string()).map_err(log_failure("write config.toml"))?;
     } else {
         // When disabling, restore backups or remove config files
         let auth_restored = restore_backup(&auth_path)?;
         let config_restored = restore_backup(&config_path)?;
 
-        if auth_restored {
-        } else if auth_path.exists() {
-            std::fs::remove_file(&auth_path).map_err(|e| {
-                tracing::error!("Failed to remove auth.json: {}", e);
-                e.to_string()
-            })?;
+        if !auth_restored {
+            remove_if_exists(&auth_path).map_err(log_failure("remove auth.json"))?;
         }
 
-        if config_restored {
-        } else if config_path.exists() {
-            std::fs::remove_file(&config_path).map_err(|e| {
-                tracing::error!("Failed to remove config.toml: {}", e);
-                e.to_string()
-            })?;
+        if !config_restored {
+            remove_if_exists(&config_path).map_err(log_failure("remove config.toml"))?;
         }
     }
 
@@ -949,33 +1139,25 @@ async fn sync_codex_config(enabled: bool, default_config: &str, _db: State<'_, S
 }
 
 // Sync Gemini configuration (settings.json + .env)
-async fn sync_gemini_config(enabled: bool, default_config: &str, _db: State<'_, SqlitePool>) -> Result<()> {
-    let home = dirs::home_dir().ok_or_else(|| "Cannot get home directory".to_string())?;
+fn sync_gemini_config(enabled: bool, default_config: &str) -> Result<()> {
+    let home = get_home_dir().ok_or_else(|| "Cannot get home directory".to_string())?;
     let gemini_dir = home.join(".gemini");
     let config_path = gemini_dir.join("settings.json");
     let env_path = gemini_dir.join(".env");
+    let lock = config_file_lock(&config_path);
+    let _guard = lock.lock().unwrap_or_else(|e| e.into_inner());
 
     if enabled {
         // Backup existing configs if not already backed up
-        if config_path.exists() && !has_backup(&config_path) {
-            backup_file(&config_path)?;
-        }
-        if env_path.exists() && !has_backup(&env_path) {
-            backup_file(&env_path)?;
-        }
+        let names = dir_entry_names(&gemini_dir);
+        backup_file(&names, &config_path)?;
+        backup_file(&names, &env_path)?;
 
         // Create config directory if it doesn't exist
-        std::fs::create_dir_all(&gemini_dir).map_err(|e| {
-            tracing::error!("Failed to create Gemini directory: {}", e);
-            e.to_string()
-        })?;
+        std::fs::create_dir_all(&gemini_dir).map_err(log_failure("create Gemini directory"))?;
 
         // Write .env file with gateway address
-        let env_content = "GEMINI_API_KEY=ccg-gateway\nGOOGLE_GEMINI_BASE_URL=http://127.0.0.1:7788\n".to_string();
-        std::fs::write(&env_path, env_content).map_err(|e| {
-            tracing::error!("Failed to write .env file: {}", e);
-            e.to_string()
-        })?;
+        write_if_changed(&env_path, GEMINI_ENV_CONTENT).map_err(log_failure("write .env file"))?;
 
         // Build base config with security.auth.selectedType
         let mut config = serde_json::json!({
@@ -987,10 +1169,10 @@ async fn sync_gemini_config(enabled: bool, default_config: &str, _db: State<'_,
         });
 
         // Merge user's custom config if provided
-        if !default_config.is_empty() {
+        if !is_blank_config(default_config) {
             match serde_json::from_str::<serde_json::Value>(default_config) {
                 Ok(custom_config) => {
-                    deep_merge(&mut config, &custom_config);
+                    deep_merge(&mut config, custom_config);
                 }
                 Err(e) => {
                     tracing::warn!("Failed to parse custom config (invalid JSON): {}", e);
@@ -999,33 +1181,19 @@ async fn sync_gemini_config(enabled: bool, default_config: &str, _db: State<'_,
         }
 
         // Write config file
-        let config_str = serde_json::to_string_pretty(&config).map_err(|e| {
-            tracing::error!("Failed to serialize config.json: {}", e);
-            e.to_string()
-        })?;
-        std::fs::write(&config_path, config_str).map_err(|e| {
-            tracing::error!("Failed to write config.json: {}", e);
-            e.to_string()
-        })?;
+        let config_bytes = serde_json::to_vec_pretty(&config).map_err(log_failure("serialize config.json"))?;
+        write_if_changed(&config_path, config_bytes).map_err(log_failure("write config.json"))?;
     } else {
         // When disabling, restore backups or remove config files
         let env_restored = restore_backup(&env_path)?;
         let config_restored = restore_backup(&config_path)?;
 
-        if env_restored {
-        } else if env_path.exists() {
-            std::fs::remove_file(&env_path).map_err(|e| {
-                tracing::error!("Failed to remove .env file: {}", e);
-                e.to_string()
-            })?;
+        if !env_restored {
+            remove_if_exists(&env_path).map_err(log_failure("remove .env file"))?;
         }
 
-        if config_restored {
-        } else if config_path.exists() {
-            std::fs::remove_file(&config_path).map_err(|e| {
-                tracing::error!("Failed to remove config.json: {}", e);
-                e.to_string()
-            })?;
+        if !config_restored {
+            remove_if_exists(&config_path).map_err(log_failure("remove config.json"))?;
         }
     }
 
@@ -1039,47 +1207,37 @@ pub async fn get_request_logs(
     page: Option<i64>,
     page_size: Option<i64>,
     cli_type: Option<String>,
+    before_id: Option<i64>,
 ) -> Result<PaginatedLogs> {
     let page = page.unwrap_or(1).max(1);
     let page_size = page_size.unwrap_or(20).clamp(1, 100);
     let offset = (page - 1) * page_size;
     let pool = &log_db.0;
 
-    let (items, total) = if let Some(ct) = cli_type {
-        let items = sqlx::query_as::<_, RequestLogItem>(
-            "SELECT id, created_at, cli_type, provider_name, model_id, status_code, elapsed_ms, input_tokens, output_tokens, client_method, client_path FROM request_logs WHERE cli_type = ? ORDER BY id DESC LIMIT ? OFFSET ?",
-        )
-        .bind(&ct)
-        .bind(page_size)
-        .bind(offset)
-        .fetch_all(pool)
-        .await
-        .map_err(|e| e.to_string())?;
-
-        let total: (i64,) = sqlx::query_as("SELECT COUNT(*) FROM request_logs WHERE cli_type = ?")
-            .bind(&ct)
-            .fetch_one(pool)
-            .await
-            .map_err(|e| e.to_string())?;
+    // 翻到下一页时前端带上当前页最后一条的 id：按主键 seek，不再扫描并丢弃前面 offset 行
+    let (filter_sql, filter_values) = log_filter_clause(&[("cli_type", cli_type.as_deref())]);
+    let sql = format!(
+        "SELECT id, created_at, cli_type, provider_name, model_id, status_code, elapsed_ms, input_tokens, output_tokens, client_method, client_path FROM request_logs WHERE 1=1{}{}",
+        filter_sql,
+        log_page_clause(before_id)
+    );
 
-        (items, total.0)
+    let mut q = sqlx::query_as::<_, RequestLogItem>(&sql);
+    for value in &filter_values {
+        q = q.bind(*value);
+    }
+    if let Some(id) = before_id {
+        q = q.bind(id).bind(page_size);
     } else {
-        let items = sqlx::query_as::<_, RequestLogItem>(
-            "SELECT id, created_at, cli_type, provider_name, model_id, status_code, elapsed_ms, input_tokens, output_tokens, client_method, client_path FROM request_logs ORDER BY id DESC LIMIT ? OFFSET ?",
-        )
-        .bind(page_size)
-        .bind(offset)
-        .fetch_all(pool)
-        .await
-        .map_err(|e| e.to_string())?;
-
-        let total: (i64,) = sqlx::query_as("SELECT COUNT(*) FROM request_logs")
-            .fetch_one(pool)
-            .await
-            .map_err(|e| e.to_string())?;
+        q = q.bind(page_size).bind(offset);
+    }
 
-        (items, total.0)
-    };
+    // 分页查询与总数互不依赖，并发执行（日志库为 WAL，读之间不阻塞）；总数短时缓存
+    let (items, total) = tokio::try_join!(
+        q.fetch_all(pool),
+        cached_log_count(pool, "request_logs", &filter_sql, &filter_values)
+    )
+    .map_err(|e| e.to_string())?;
 
     Ok(PaginatedLogs {
         items,
@@ -1095,6 +1253,7 @@ pub async fn clear_request_logs(log_db: State<'_, crate::LogDb>) -> Result<()> {
         .execute(&log_db.0)
         .await
         .map_err(|e| e.to_string())?;
+    invalidate_log_count("request_logs");
     Ok(())
 }
 
@@ -1103,13 +1262,14 @@ pub async fn get_request_log_detail(
     log_db: State<'_, crate::LogDb>,
     id: i64,
 ) -> Result<RequestLogDetail> {
-    sqlx::query_as::<_, RequestLogDetail>(
+    sqlx::query_as::<_, RequestLogDetailRow>(
         "SELECT id, created_at, cli_type, provider_name, model_id, status_code, elapsed_ms, input_tokens, output_tokens, client_method, client_path, client_headers, client_body, forward_url, forward_headers, forward_body, provider_headers, provider_body, response_headers, response_body, error_message FROM request_logs WHERE id = ?",
     )
     .bind(id)
     .fetch_optional(&log_db.0)
     .await
     .map_err(|e| e.to_string())?
+    .map(RequestLogDetail::from)
     .ok_or_else(|| "Log not found".to_string())
 }
 
@@ -1122,61 +1282,40 @@ pub async fn get_system_logs(
     level: Option<String>,
     event_type: Option<String>,
     provider_name: Option<String>,
+    before_id: Option<i64>,
 ) -> Result<SystemLogListResponse> {
     let page = page.unwrap_or(1).max(1);
     let page_size = page_size.unwrap_or(20).clamp(1, 100);
     let offset = (page - 1) * page_size;
 
-    // Build query
-    let mut sql = "SELECT * FROM system_logs WHERE 1=1".to_string();
-    let mut count_sql = "SELECT COUNT(*) FROM system_logs WHERE 1=1".to_string();
-
-    if level.is_some() {
-        sql.push_str(" AND level = ?");
-        count_sql.push_str(" AND level = ?");
-    }
-    if event_type.is_some() {
-        sql.push_str(" AND event_type = ?");
-        count_sql.push_str(" AND event_type = ?");
-    }
-    if provider_name.is_some() {
-        sql.push_str(" AND provider_name = ?");
-        count_sql.push_str(" AND provider_name = ?");
-    }
-
-    sql.push_str(" ORDER BY id DESC LIMIT ? OFFSET ?");
-    let mut q = sqlx::query_as::<_, SystemLogItem>(&sql)
-        .bind(page_size)
-        .bind(offset);
+    // Build query：过滤条件只构建一次，列表与 COUNT 共用
+    let (filter_sql, filter_values) = log_filter_clause(&[
+        ("level", level.as_deref()),
+        ("event_type", event_type.as_deref()),
+        ("provider_name", provider_name.as_deref()),
+    ]);
+    let sql = format!(
+        "SELECT id, created_at, level, event_type, provider_name, message, details FROM system_logs WHERE 1=1{}{}",
+        filter_sql,
+        log_page_clause(before_id)
+    );
 
-    if let Some(ref lvl) = level {
-        q = q.bind(lvl);
+    // 过滤条件的占位符在 LIMIT/OFFSET 之前，需先绑定
+    let mut q = sqlx::query_as::<_, SystemLogItem>(&sql);
+    for value in &filter_values {
+        q = q.bind(*value);
     }
-    if let Some(ref et) = event_type {
-        q = q.bind(et);
-    }
-    if let Some(ref pn) = provider_name {
-        q = q.bind(pn);
+    if let Some(id) = before_id {
+        q = q.bind(id).bind(page_size);
+    } else {
+        q = q.bind(page_size).bind(offset);
     }
 
-    let items = q.fetch_all(&log_db.0)
-        .await
-        .map_err(|e| e.to_string())?;
-
-    // Get total count
-    let mut count_q = sqlx::query_as::<_, (i64,)>(&count_sql);
-    if let Some(ref lvl) = level {
-        count_q = count_q.bind(lvl);
-    }
-    if let Some(ref et) = event_type {
-        count_q = count_q.bind(et);
-    }
-    if let Some(ref pn) = provider_name {
-        count_q = count_q.bind(pn);
-    }
-    let (total,) = count_q.fetch_one(&log_db.0)
-        .await
-        .map_err(|e| e.to_string())?;
+    let (items, total) = tokio::try_join!(
+        q.fetch_all(&log_db.0),
+        cached_log_count(&log_db.0, "system_logs", &filter_sql, &filter_values)
+    )
+    .map_err(|e| e.to_string())?;
 
     Ok(SystemLogListResponse {
         items,
@@ -1192,6 +1331,7 @@ pub async fn clear_system_logs(log_db: State<'_, crate::LogDb>) -> Result<()> {
         .execute(&log_db.0)
         .await
         .map_err(|e| e.to_string())?;
+    invalidate_log_count("system_logs");
     Ok(())
 }
 
@@ -1215,14 +1355,15 @@ pub async fn get_mcps(db: State<'_, SqlitePool>) -> Result<Vec<McpResponse>> {
         .await
         .map_err(|e| e.to_string())?;
 
-    let cli_types = vec!["claude_code", "codex", "gemini"];
+    // 每个 CLI 的 MCP 名称集合只取一次，供所有 MCP 判断
+    let names_by_cli = CLI_TYPES.map(mcp_names_in_file);
 
     let mut results = Vec::new();
     for mcp in mcps {
         // Read real status from config files
         let mut cli_flags = Vec::new();
-        for cli_type in &cli_types {
-            let enabled = mcp_enabled_in_file(cli_type, &mcp.name);
+        for (cli_type, names) in CLI_TYPES.iter().zip(&names_by_cli) {
+            let enabled = names.contains(&mcp.name);
             cli_flags.push(McpCliFlag {
                 cli_type: cli_type.to_string(),
                 enabled,
@@ -1249,9 +1390,8 @@ pub async fn get_mcp(db: State<'_, SqlitePool>, id: i64) -> Result<McpResponse>
         .ok_or_else(|| "MCP not found".to_string())?;
 
     // Read real status from config files
-    let cli_types = vec!["claude_code", "codex", "gemini"];
     let mut cli_flags = Vec::new();
-    for cli_type in &cli_types {
+    for cli_type in CLI_TYPES {
         let enabled = mcp_enabled_in_file(cli_type, &mcp.name);
         cli_flags.push(McpCliFlag {
             cli_type: cli_type.to_string(),
@@ -1358,11 +1498,33 @@ pub async fn delete_mcp(db: State<'_, SqlitePool>, id: i64) -> Result<()> {
         .map_err(|e| e.to_string())?;
 
     // Remove from all CLI configs
-    delete_mcp_from_cli(&mcp_name)?;
+    delete_mcp_from_cli(&mcp_name).await?;
 
     Ok(())
 }
 
+/// 各 CLI 的配置文件互不相关，放到阻塞线程池并发处理，总耗时取决于最慢的一个
+/// 所有 CLI 都会执行，返回遇到的第一个错误
+async fn for_each_cli_blocking<F>(f: F) -> Result<()>
+where
+    F: Fn(&'static str) -> Result<()> + Send + Sync + 'static,
+{
+    let f = std::sync::Arc::new(f);
+    let tasks = CLI_TYPES.map(|cli_type| {
+        let f = f.clone();
+        tokio::task::spawn_blocking(move || f(cli_type))
+    });
+
+    let mut result = Ok(());
+    for task in tasks {
+        let task_result = task.await.map_err(|e| e.to_string()).and_then(|r| r);
+        if result.is_ok() {
+            result = task_result;
+        }
+    }
+    result
+}
+
 // Sync a single MCP to CLI files based on enabled flags
 async fn sync_single_mcp_to_cli(
     _mcp_id: i64,
@@ -1370,83 +1532,141 @@ async fn sync_single_mcp_to_cli(
     mcp_config_json: &str,
     cli_flags: &[McpCliFlag],
 ) -> Result<()> {
-    let cli_types = vec!["claude_code", "codex", "gemini"];
+    // MCP 配置只解析一次，供各 CLI 共用；全部禁用时无需解析
+    let mcp_json = if cli_flags.iter().any(|f| f.enabled) {
+        serde_json::from_str::<serde_json::Value>(mcp_config_json).ok()
+    } else {
+        None
+    };
+
+    let mcp_name = mcp_name.to_string();
+    let enabled_clis: Vec<String> = cli_flags
+        .iter()
+        .filter(|f| f.enabled)
+        .map(|f| f.cli_type.clone())
+        .collect();
 
-    for cli_type in cli_types {
+    for_each_cli_blocking(move |cli_type| {
         // Check if this MCP is enabled for this CLI
-        let is_enabled = cli_flags.iter()
-            .any(|f| f.cli_type == cli_type && f.enabled);
-
-        let config_path = get_mcp_config_path(cli_type);
-        if let Some(path) = config_path {
-            // Handle Codex separately (TOML format)
-            if cli_type == "codex" {
-                sync_single_codex_mcp(path, mcp_name, mcp_config_json, is_enabled)?;
-                continue;
-            }
+        let is_enabled = enabled_clis.iter().any(|c| c == cli_type);
 
-            // For ClaudeCode and Gemini (JSON format)
-            // Read existing config or create new one
-            let mut config = if path.exists() {
-                let content = std::fs::read_to_string(&path).map_err(|e| e.to_string())?;
-                serde_json::from_str::<serde_json::Value>(&content).unwrap_or_else(|_| serde_json::json!({}))
-            } else {
-                serde_json::json!({})
-            };
+        let Some(path) = get_mcp_config_path(cli_type) else {
+            return Ok(());
+        };
 
-            // Update MCP section
-            if is_enabled {
-                // Add or update this MCP
-                if let Ok(mcp_json) = serde_json::from_str::<serde_json::Value>(mcp_config_json) {
-                    if let Some(obj) = config.as_object_mut() {
-                        if !obj.contains_key("mcpServers") {
-                            obj.insert("mcpServers".to_string(), serde_json::json!({}));
-                        }
-                        if let Some(servers) = obj.get_mut("mcpServers").and_then(|v| v.as_object_mut()) {
-                            servers.insert(mcp_name.to_string(), mcp_json);
-                        }
-                    }
+        // Handle Codex separately (TOML format)
+        if cli_type == "codex" {
+            sync_single_codex_mcp(path, &mcp_name, mcp_json.as_ref(), is_enabled)
+        } else {
+            sync_single_json_mcp(path, &mcp_name, mcp_json.as_ref(), is_enabled)
+        }
+    })
+    .await
+}
+
+// Helper function to sync a single MCP to ClaudeCode / Gemini JSON config
+fn sync_single_json_mcp(
+    path: std::path::PathBuf,
+    mcp_name: &str,
+    mcp_json: Option<&serde_json::Value>,
+    is_enabled: bool,
+) -> Result<()> {
+    let lock = config_file_lock(&path);
+    let _guard = lock.lock().unwrap_or_else(|e| e.into_inner());
+
+    // 禁用且配置文件不存在时无需处理（该 MCP 从未写入此 CLI）
+    let existing = read_if_exists(&path).map_err(|e| e.to_string())?;
+    if !is_enabled && existing.is_none() {
+        return Ok(());
+    }
+
+    // Read existing config or create new one
+    let mut config = match existing {
+        Some(content) => {
+            serde_json::from_slice::<serde_json::Value>(&content).unwrap_or_else(|_| serde_json::json!({}))
+        }
+        None => serde_json::json!({}),
+    };
+
+    // Update MCP section
+    // 内容未变化时不重写文件，避免无谓写盘并触发 CLI 的配置重载
+    let mut changed = false;
+    if is_enabled {
+        // Add or update this MCP
+        if let Some(mcp_json) = mcp_json {
+            if let Some(obj) = config.as_object_mut() {
+                if !obj.contains_key("mcpServers") {
+                    obj.insert("mcpServers".to_string(), serde_json::json!({}));
                 }
-            } else {
-                // Remove this MCP by name
-                if let Some(obj) = config.as_object_mut() {
-                    if let Some(servers) = obj.get_mut("mcpServers").and_then(|v| v.as_object_mut()) {
-                        servers.remove(mcp_name);
+                if let Some(servers) = obj.get_mut("mcpServers").and_then(|v| v.as_object_mut()) {
+                    if servers.get(mcp_name) != Some(mcp_json) {
+                        servers.insert(mcp_name.to_string(), mcp_json.clone());
+                        changed = true;
                     }
                 }
             }
-
-            // Write config file
-            if let Some(parent) = path.parent() {
-                std::fs::create_dir_all(parent).map_err(|e| e.to_string())?;
+        }
+    } else {
+        // Remove this MCP by name
+        if let Some(obj) = config.as_object_mut() {
+            if let Some(servers) = obj.get_mut("mcpServers").and_then(|v| v.as_object_mut()) {
+                changed = servers.remove(mcp_name).is_some();
             }
-            let config_str = serde_json::to_string_pretty(&config).map_err(|e| e.to_string())?;
-            std::fs::write(&path, config_str).map_err(|e| e.to_string())?;
         }
     }
 
+    if !changed {
+        return Ok(());
+    }
+
+    // Write config file
+    if let Some(parent) = path.parent() {
+        std::fs::create_dir_all(parent).map_err(|e| e.to_string())?;
+    }
+    let config_bytes = serde_json::to_vec_pretty(&config).map_err(|e| e.to_string())?;
+    write_atomic(&path, config_bytes).map_err(|e| e.to_string())?;
+
     Ok(())
 }
 
+/// 写入 config.toml 的 MCP 字段，按此顺序输出：serde_json 的对象按字母序遍历，
+/// 直接遍历会打乱已有 [mcp_servers.*] 表的字段顺序，导致每次同步都重写文件
+const CODEX_MCP_FIELDS: [&str; 7] = [
+    "command",
+    "args",
+    "env",
+    "cwd",
+    "url",
+    "startup_timeout_sec",
+    "tool_timeout_sec",
+];
+
 // Helper function to sync a single MCP to Codex config.toml
 fn sync_single_codex_mcp(
     config_path: std::path::PathBuf,
     mcp_name: &str,
-    mcp_config_json: &str,
+    mcp_config: Option<&serde_json::Value>,
     is_enabled: bool,
 ) -> Result<()> {
+    let lock = config_file_lock(&config_path);
+    let _guard = lock.lock().unwrap_or_else(|e| e.into_inner());
+
+    // 禁用且配置文件不存在时无需处理，避免凭空创建只含空表的 config.toml
+    let original = match read_if_exists(&config_path).map_err(log_failure("read config.toml"))? {
+        Some(bytes) => Some(String::from_utf8(bytes).map_err(log_failure("read config.toml"))?),
+        None => None,
+    };
+    if !is_enabled && original.is_none() {
+        return Ok(());
+    }
+
     // Read existing TOML or create new one
-    let mut doc = if config_path.exists() {
-        let content = std::fs::read_to_string(&config_path).map_err(|e| {
-            tracing::error!("Failed to read config.toml: {}", e);
-            e.to_string()
-        })?;
-        content.parse::<toml_edit::DocumentMut>().unwrap_or_else(|e| {
+    let mut doc = match original.as_deref() {
+        Some(content) => content.parse::<toml_edit::DocumentMut>().unwrap_or_else(|e| {
             tracing::warn!("Failed to parse config.toml, creating new: {}", e);
             toml_edit::DocumentMut::new()
-        })
-    } else {
-        toml_edit::DocumentMut::new()
+        }),
+        None => toml_edit::DocumentMut::new(),
     };
 
     // Ensure mcp_servers table exists
@@ -1456,49 +1676,45 @@ fn sync_single_codex_mcp(
 
     if is_enabled {
         // Add or update this MCP
-        if let Ok(mcp_config) = serde_json::from_str::<serde_json::Value>(mcp_config_json) {
+        if let Some(mcp_config) = mcp_config {
             let mcp_type = mcp_config.get("type").and_then(|v| v.as_str()).unwrap_or("stdio");
 
             // Create MCP server table
+            // 按固定字段顺序映射到 TOML
             let mut server_table = toml_edit::Table::new();
+            let is_remote = mcp_type == "sse" || mcp_type == "http";
 
-            // Handle STDIO type servers
-            if let Some(command) = mcp_config.get("command").and_then(|v| v.as_str()) {
-                server_table.insert("command", toml_edit::value(command));
-            }
-            if let Some(args) = mcp_config.get("args").and_then(|v| v.as_array()) {
-                let args_array: toml_edit::Array = args.iter()
-                    .filter_map(|v| v.as_str())
-                    .map(toml_edit::Value::from)
-                    .collect();
-                server_table.insert("args", toml_edit::Item::Value(args_array.into()));
-            }
-            if let Some(env) = mcp_config.get("env").and_then(|v| v.as_object()) {
-                let mut env_table = toml_edit::Table::new();
-                for (k, v) in env.iter() {
-                    if let Some(v_str) = v.as_str() {
-                        env_table.insert(k, toml_edit::value(v_str));
+            for key in CODEX_MCP_FIELDS {
+                let Some(value) = mcp_config.get(key) else {
+                    continue;
+                };
+                if key == "command" || key == "cwd" || (is_remote && key == "url") {
+                    if let Some(v) = value.as_str() {
+                        server_table.insert(key, toml_edit::value(v));
+                    }
+                } else if key == "startup_timeout_sec" || key == "tool_timeout_sec" {
+                    if let Some(v) = value.as_i64() {
+                        server_table.insert(key, toml_edit::value(v));
+                    }
+                } else if key == "args" {
+                    if let Some(args) = value.as_array() {
+                        let args_array: toml_edit::Array = args.iter()
+                            .filter_map(|v| v.as_str())
+                            .map(toml_edit::Value::from)
+                            .collect();
+                        server_table.insert("args", toml_edit::Item::Value(args_array.into()));
+                    }
+                } else if key == "env" {
+                    if let Some(env) = value.as_object() {
+                        let mut env_table = toml_edit::Table::new();
+                        for (k, v) in env.iter() {
+                            if let Some(v_str) = v.as_str() {
+                                env_table.insert(k, toml_edit::value(v_str));
+                            }
+                        }
+                        server_table.insert("env", toml_edit::Item::Table(env_table));
                     }
                 }
-                server_table.insert("env", toml_edit::Item::Table(env_table));
-            }
-            if let Some(cwd) = mcp_config.get("cwd").and_then(|v| v.as_str()) {
-                server_table.insert("cwd", toml_edit::value(cwd));
-            }
-
-            // Handle HTTP/SSE type servers
-            if mcp_type == "sse" || mcp_type == "http" {
-                if let Some(url) = mcp_config.get("url").and_then(|v| v.as_str()) {
-                    server_table.insert("url", toml_edit::value(url));
-                }
-            }
-
-            // Optional fields
-            if let Some(timeout) = mcp_config.get("startup_timeout_sec").and_then(|v| v.as_i64()) {
-                server_table.insert("startup_timeout_sec", toml_edit::value(timeout));
-            }
-            if let Some(timeout) = mcp_config.get("tool_timeout_sec").and_then(|v| v.as_i64()) {
-                server_table.insert("tool_timeout_sec", toml_edit::value(timeout));
             }
 
             doc["mcp_servers"][mcp_name] = toml_edit::Item::Table(server_table);
@@ -1510,58 +1726,70 @@ fn sync_single_codex_mcp(
         }
     }
 
+    // toml_edit 保留原格式，渲染结果与原文件一致即说明无变化，跳过写入
+    let rendered = doc.to_string();
+    if original.as_deref() == Some(rendered.as_str()) {
+        return Ok(());
+    }
+
     // Write config file
     if let Some(parent) = config_path.parent() {
-        std::fs::create_dir_all(parent).map_err(|e| {
-            tracing::error!("Failed to create directory: {}", e);
-            e.to_string()
-        })?;
+        std::fs::create_dir_all(parent).map_err(log_failure("create directory"))?;
     }
-    std::fs::write(&config_path, doc.to_string()).map_err(|e| {
-        tracing::error!("Failed to write config.toml: {}", e);
-        e.to_string()
-    })?;
+    write_atomic(&config_path, rendered).map_err(log_failure("write config.toml"))?;
 
     Ok(())
 }
 
 // Delete a single MCP from all CLI configs
-fn delete_mcp_from_cli(mcp_name: &str) -> Result<()> {
-    let cli_types = vec!["claude_code", "codex", "gemini"];
-
-    for cli_type in cli_types {
-        let config_path = get_mcp_config_path(cli_type);
-        if let Some(path) = config_path {
-            if !path.exists() {
-                continue;
+async fn delete_mcp_from_cli(mcp_name: &str) -> Result<()> {
+    let mcp_name = mcp_name.to_string();
+
+    for_each_cli_blocking(move |cli_type| {
+        let Some(path) = get_mcp_config_path(cli_type) else {
+            return Ok(());
+        };
+        let lock = config_file_lock(&path);
+        let _guard = lock.lock().unwrap_or_else(|e| e.into_inner());
+        let Some(content) = read_if_exists(&path).map_err(|e| e.to_string())? else {
+            return Ok(());
+        };
+
+        if cli_type == "codex" {
+            // Handle Codex TOML format
+            let content = String::from_utf8(content).map_err(|e| e.to_string())?;
+            let mut doc = content.parse::<toml_edit::DocumentMut>().unwrap_or_else(|_| toml_edit::DocumentMut::new());
+
+            let removed = doc
+                .get_mut("mcp_servers")
+                .and_then(|v| v.as_table_mut())
+                .and_then(|table| table.remove(&mcp_name))
+                .is_some();
+            if !removed {
+                return Ok(());
             }
 
-            if cli_type == "codex" {
-                // Handle Codex TOML format
-                let content = std::fs::read_to_string(&path).map_err(|e| e.to_string())?;
-                let mut doc = content.parse::<toml_edit::DocumentMut>().unwrap_or_else(|_| toml_edit::DocumentMut::new());
-
-                if let Some(table) = doc["mcp_servers"].as_table_mut() {
-                    table.remove(mcp_name);
-                }
-
-                std::fs::write(&path, doc.to_string()).map_err(|e| e.to_string())?;
-            } else {
-                // Handle Claude/Gemini JSON format
-                let content = std::fs::read_to_string(&path).map_err(|e| e.to_string())?;
-                let mut config: serde_json::Value = serde_json::from_str(&content).unwrap_or_else(|_| serde_json::json!({}));
-
-                if let Some(mcp_servers) = config.get_mut("mcpServers").and_then(|v| v.as_object_mut()) {
-                    mcp_servers.remove(mcp_name);
-                }
-
-                let config_str = serde_json::to_string_pretty(&config).map_err(|e| e.to_string())?;
-                std::fs::write(&path, config_str).map_err(|e| e.to_string())?;
+            write_atomic(&path, doc.to_string()).map_err(|e| e.to_string())?;
+        } else {
+            // Handle Claude/Gemini JSON format
+            let mut config: serde_json::Value = serde_json::from_slice(&content).unwrap_or_else(|_| serde_json::json!({}));
+
+            let removed = config
+                .get_mut("mcpServers")
+                .and_then(|v| v.as_object_mut())
+                .and_then(|mcp_servers| mcp_servers.remove(&mcp_name))
+                .is_some();
+            if !removed {
+                return Ok(());
             }
+
+            let config_bytes = serde_json::to_vec_pretty(&config).map_err(|e| e.to_string())?;
+            write_atomic(&path, config_bytes).map_err(|e| e.to_string())?;
         }
-    }
 
-    Ok(())
+        Ok(())
+    })
+    .await
 }
 
 // Prompt commands
@@ -1572,13 +1800,11 @@ pub async fn get_prompts(db: State<'_, SqlitePool>) -> Result<Vec<PromptResponse
         .await
         .map_err(|e| e.to_string())?;
 
-    let cli_types = vec!["claude_code", "codex", "gemini"];
-
     let mut results = Vec::new();
     for prompt in prompts {
         // Read real status from prompt files
         let mut cli_flags = Vec::new();
-        for cli_type in &cli_types {
+        for cli_type in CLI_TYPES {
             let enabled = prompt_enabled_in_file(cli_type, &prompt.content);
             cli_flags.push(PromptCliFlag {
                 cli_type: cli_type.to_string(),
@@ -1606,9 +1832,8 @@ pub async fn get_prompt(db: State<'_, SqlitePool>, id: i64) -> Result<PromptResp
         .ok_or_else(|| "Prompt not found".to_string())?;
 
     // Read real status from prompt files
-    let cli_types = vec!["claude_code", "codex", "gemini"];
     let mut cli_flags = Vec::new();
-    for cli_type in &cli_types {
+    for cli_type in CLI_TYPES {
         let enabled = prompt_enabled_in_file(cli_type, &prompt.content);
         cli_flags.push(PromptCliFlag {
             cli_type: cli_type.to_string(),
@@ -1714,46 +1939,47 @@ async fn sync_single_prompt_to_cli(
     prompt_content: &str,
     cli_flags: &[PromptCliFlag],
 ) -> Result<()> {
-    let cli_types = vec!["claude_code", "codex", "gemini"];
+    let prompt_content = prompt_content.to_string();
+    let enabled_clis: Vec<String> = cli_flags
+        .iter()
+        .filter(|f| f.enabled)
+        .map(|f| f.cli_type.clone())
+        .collect();
 
-    for cli_type in cli_types {
+    for_each_cli_blocking(move |cli_type| {
         // Check if this prompt is enabled for this CLI
-        let is_enabled = cli_flags.iter()
-            .any(|f| f.cli_type == cli_type && f.enabled);
+        let is_enabled = enabled_clis.iter().any(|c| c == cli_type);
 
         // Get the prompt file path for this CLI
-        let prompt_path = get_prompt_file_path(cli_type);
-        if let Some(path) = prompt_path {
-            // Check if CLI directory exists (skip if CLI not installed)
-            if let Some(parent) = path.parent() {
-                if !parent.exists() {
-                    continue;
-                }
+        let Some(path) = get_prompt_file_path(cli_type) else {
+            return Ok(());
+        };
+
+        // Check if CLI directory exists (skip if CLI not installed)
+        let Some(parent) = path.parent() else {
+            return Ok(());
+        };
+        if !parent.exists() {
+            return Ok(());
+        }
 
-                if is_enabled {
-                    // Write prompt content to file
-                    std::fs::write(&path, prompt_content).map_err(|e| {
-                        tracing::error!("Failed to write prompt file: {}", e);
-                        e.to_string()
-                    })?;
-                } else {
-                    // Check if this prompt was previously in the file
-                    if path.exists() {
-                        let file_content = std::fs::read_to_string(&path).unwrap_or_default();
-                        if normalize_text(prompt_content) == normalize_text(&file_content) {
-                            // This prompt was in the file, clear it
-                            std::fs::write(&path, "").map_err(|e| {
-                                tracing::error!("Failed to clear prompt file: {}", e);
-                                e.to_string()
-                            })?;
-                        }
-                    }
+        if is_enabled {
+            // Write prompt content to file
+            write_if_changed(&path, &prompt_content).map_err(log_failure("write prompt file"))?;
+        } else {
+            // Check if this prompt was previously in the file
+            if let Ok(Some(file_content)) = read_if_exists(&path) {
+                let file_content = String::from_utf8_lossy(&file_content);
+                if normalize_text(&prompt_content) == normalize_text(&file_content) {
+                    // This prompt was in the file, clear it
+                    std::fs::write(&path, "").map_err(log_failure("clear prompt file"))?;
                 }
             }
         }
-    }
 
-    Ok(())
+        Ok(())
+    })
+    .await
 }
 
 async fn sync_prompt_configs_to_cli(_db: State<'_, SqlitePool>) -> Result<()> {
@@ -1762,7 +1988,7 @@ async fn sync_prompt_configs_to_cli(_db: State<'_, SqlitePool>) -> Result<()> {
 }
 
 fn get_prompt_file_path(cli_type: &str) -> Option<std::path::PathBuf> {
-    let home = dirs::home_dir()?;
+    let home = get_home_dir()?;
     match cli_type {
         "claude_code" => Some(home.join(".claude").join("CLAUDE.md")),
         "codex" => Some(home.join(".codex").join("AGENTS.md")),
@@ -1781,7 +2007,7 @@ pub async fn get_daily_stats(
 ) -> Result<Vec<DailyStats>> {
     let pool = &log_db.0;
 
-    let mut query = "SELECT * FROM usage_daily WHERE 1=1".to_string();
+    let mut query = "SELECT usage_date, provider_name, cli_type, request_count, success_count, failure_count, input_tokens, output_tokens FROM usage_daily WHERE 1=1".to_string();
     if start_date.is_some() {
         query.push_str(" AND usage_date >= ?");
     }
@@ -1880,7 +2106,7 @@ pub async fn get_provider_stats(
 
 // Session helpers
 fn get_cli_base_dir(cli_type: &str) -> std::path::PathBuf {
-    let home = dirs::home_dir().unwrap_or_default();
+    let home = get_home_dir().unwrap_or_default();
     match cli_type {
         "codex" => home.join(".codex"),
         "gemini" => home.join(".gemini"),
@@ -2103,7 +2329,7 @@ fn get_codex_sessions(project_name: &str, page: i64, page_size: i64) -> Result<P
     use std::io::{BufRead, BufReader};
     use walkdir::WalkDir;
     
-    let home = dirs::home_dir().unwrap_or_default();
+    let home = get_home_dir().unwrap_or_default();
     let sessions_dir = home.join(".codex").join("sessions");
     
     if !sessions_dir.exists() {
@@ -2211,7 +2437,7 @@ fn get_codex_sessions(project_name: &str, page: i64, page_size: i64) -> Result<P
 
 // Handle Gemini sessions
 fn get_gemini_sessions(project_name: &str, page: i64, page_size: i64) -> Result<PaginatedSessions> {
-    let home = dirs::home_dir().unwrap_or_default();
+    let home = get_home_dir().unwrap_or_default();
     let chats_dir = home.join(".gemini").join("tmp").join(project_name).join("chats");
     
     if !chats_dir.exists() {
@@ -2312,7 +2538,7 @@ fn get_codex_messages(session_id: &str) -> Result<Vec<SessionMessage>> {
     use std::io::{BufRead, BufReader};
     use walkdir::WalkDir;
     
-    let home = dirs::home_dir().unwrap_or_default();
+    let home = get_home_dir().unwrap_or_default();
     let sessions_dir = home.join(".codex").join("sessions");
     
     // Find the session file by searching recursively
@@ -2850,8 +3076,27 @@ async fn exit_application() -> Result<()> {
 }
 
 // Backup commands
+
+/// WebDAV 操作共用的 HTTP 客户端
+/// 凭据按请求通过 basic_auth 传入，因此客户端与设置无关，可跨命令复用连接池与 TLS 会话
+fn webdav_client() -> &'static reqwest::Client {
+    static CLIENT: std::sync::OnceLock<reqwest::Client> = std::sync::OnceLock::new();
+    CLIENT.get_or_init(reqwest::Client::new)
+}
+
+/// WebDAV 设置缓存（单行配置，仅在 update_webdav_settings 中修改，写穿更新）
+fn webdav_settings_cache() -> &'static std::sync::RwLock<Option<WebdavSettings>> {
+    static CACHE: std::sync::OnceLock<std::sync::RwLock<Option<WebdavSettings>>> =
+        std::sync::OnceLock::new();
+    CACHE.get_or_init(|| std::sync::RwLock::new(None))
+}
+
 #[tauri::command]
 pub async fn get_webdav_settings(db: State<'_, SqlitePool>) -> Result<WebdavSettings> {
+    if let Some(cached) = webdav_settings_cache().read().unwrap().as_ref() {
+        return Ok(cached.clone());
+    }
+
     // Try to get existing settings
     let settings = sqlx::query_as::<_, WebdavSettings>(
         "SELECT url, username, password FROM webdav_settings WHERE id = 1"
@@ -2860,8 +3105,8 @@ pub async fn get_webdav_settings(db: State<'_, SqlitePool>) -> Result<WebdavSett
     .await
     .map_err(|e| e.to_string())?;
 
-    match settings {
-        Some(s) => Ok(s),
+    let settings = match settings {
+        Some(s) => s,
         None => {
             // Create default settings
             let now = chrono::Utc::now().timestamp();
@@ -2873,13 +3118,16 @@ pub async fn get_webdav_settings(db: State<'_, SqlitePool>) -> Result<WebdavSett
             .await
             .map_err(|e| e.to_string())?;
 
-            Ok(WebdavSettings {
+            WebdavSettings {
                 url: String::new(),
                 username: String::new(),
                 password: String::new(),
-            })
+            }
         }
-    }
+    };
+
+    *webdav_settings_cache().write().unwrap() = Some(settings.clone());
+    Ok(settings)
 }
 
 #[tauri::command]
@@ -2890,18 +3138,25 @@ pub async fn update_webdav_settings(
     let now = chrono::Utc::now().timestamp();
     let current = get_webdav_settings(db.clone()).await?;
 
+    let settings = WebdavSettings {
+        url: input.url.unwrap_or(current.url),
+        username: input.username.unwrap_or(current.username),
+        password: input.password.unwrap_or(current.password),
+    };
+
     sqlx::query(
         "UPDATE webdav_settings SET url = ?, username = ?, password = ?, updated_at = ? WHERE id = 1"
     )
-    .bind(input.url.unwrap_or(current.url))
-    .bind(input.username.unwrap_or(current.username))
-    .bind(input.password.unwrap_or(current.password))
+    .bind(&settings.url)
+    .bind(&settings.username)
+    .bind(&settings.password)
     .bind(now)
     .execute(db.inner())
     .await
     .map_err(|e| e.to_string())?;
 
-    get_webdav_settings(db).await
+    *webdav_settings_cache().write().unwrap() = Some(settings.clone());
+    Ok(settings)
 }
 
 #[tauri::command]
@@ -2910,9 +3165,7 @@ pub async fn test_webdav_connection(
     username: String,
     password: String,
 ) -> Result<bool> {
-    use reqwest::Client;
-
-    let client = Client::new();
+    let client = webdav_client();
     let response = client
         .request(reqwest::Method::from_bytes(b"PROPFIND").unwrap(), &url)
         .basic_auth(&username, Some(&password))
@@ -2924,16 +3177,36 @@ pub async fn test_webdav_connection(
     Ok(response.status().is_success() || response.status().as_u16() == 207)
 }
 
-#[tauri::command]
-pub async fn export_to_local() -> Result<Vec<u8>> {
-    // Get the database path from config
-    let db_path = get_data_dir().join("ccg_gateway.db");
+/// 生成主数据库的一致性快照并返回其内容
+/// 使用 VACUUM INTO 由 SQLite 在读事务内写出完整副本，不会读到写了一半的页，
+/// 同时顺带压缩掉空闲页，导出文件更小
+async fn snapshot_database(db: &SqlitePool) -> Result<Vec<u8>> {
+    let snapshot_path = get_data_dir().join(format!(
+        "ccg_gateway.snapshot-{}.db",
+        chrono::Utc::now().timestamp_millis()
+    ));
+
+    // VACUUM INTO 要求目标文件不存在
+    let _ = tokio::fs::remove_file(&snapshot_path).await;
+
+    sqlx::query("VACUUM INTO ?")
+        .bind(snapshot_path.to_string_lossy().to_string())
+        .execute(db)
+        .await
+        .map_err(|e| format!("Failed to snapshot database: {}", e))?;
+
+    let content = tokio::fs::read(&snapshot_path)
+        .await
+        .map_err(|e| format!("Failed to read database: {}", e));
+
+    let _ = tokio::fs::remove_file(&snapshot_path).await;
 
-    // Read the database file
-    let content = std::fs::read(&db_path)
-        .map_err(|e| format!("Failed to read database: {}", e))?;
+    content
+}
 
-    Ok(content)
+#[tauri::command]
+pub async fn export_to_local(db: State<'_, SqlitePool>) -> Result<Vec<u8>> {
+    snapshot_database(db.inner()).await
 }
 
 #[tauri::command]
@@ -2941,7 +3214,8 @@ pub async fn import_from_local(data: Vec<u8>) -> Result<()> {
     let db_path = get_data_dir().join("ccg_gateway.db");
 
     // Write the database file
-    std::fs::write(&db_path, &data)
+    tokio::fs::write(&db_path, &data)
+        .await
         .map_err(|e| format!("Failed to write database: {}", e))?;
 
     // 退出应用，用户需手动重启
@@ -2952,26 +3226,25 @@ pub async fn import_from_local(data: Vec<u8>) -> Result<()> {
 
 #[tauri::command]
 pub async fn export_to_webdav(db: State<'_, SqlitePool>) -> Result<String> {
-    use reqwest::Client;
-
     let settings = get_webdav_settings(db.clone()).await?;
     if settings.url.is_empty() {
         return Err("WebDAV URL not configured".to_string());
     }
 
-    // Read database file
-    let db_path = get_data_dir().join("ccg_gateway.db");
-    let content = std::fs::read(&db_path)
-        .map_err(|e| format!("Failed to read database: {}", e))?;
+    // 一致性快照（VACUUM INTO），不会上传写了一半的页
+    let content = snapshot_database(db.inner()).await?;
 
     // Generate filename
     let filename = format!(
-        "ccg_gateway_{}.db",
+        "ccg_gateway_{}.db.gz",
         chrono::Local::now().format("%Y%m%d_%H%M%S")
     );
 
+    // SQLite 文件压缩率高，上传前 gzip 以减少传输量
+    let content = gzip_backup(content).await?;
+
     // Ensure remote directory exists
-    let client = Client::new();
+    let client = webdav_client();
     let remote_dir = format!("{}/ccg-gateway-backup", settings.url.trim_end_matches('/'));
 
     // Try to create directory (ignore error if exists)
@@ -3000,14 +3273,12 @@ pub async fn export_to_webdav(db: State<'_, SqlitePool>) -> Result<String> {
 
 #[tauri::command]
 pub async fn list_webdav_backups(db: State<'_, SqlitePool>) -> Result<Vec<WebdavBackup>> {
-    use reqwest::Client;
-
     let settings = get_webdav_settings(db).await?;
     if settings.url.is_empty() {
         return Err("WebDAV URL not configured".to_string());
     }
 
-    let client = Client::new();
+    let client = webdav_client();
     let remote_dir = format!("{}/ccg-gateway-backup", settings.url.trim_end_matches('/'));
 
     let response = client
@@ -3076,8 +3347,10 @@ pub async fn list_webdav_backups(db: State<'_, SqlitePool>) -> Result<Vec<Webdav
                 if name.ends_with(":response") || name == "response" {
                     in_response = false;
                     
-                    // Check if this is a .db file we care about
-                    if current_href.contains("ccg_gateway_") && current_href.ends_with(".db") {
+                    // Check if this is a backup file we care about (.db or gzip 压缩的 .db.gz)
+                    if current_href.contains("ccg_gateway_")
+                        && (current_href.ends_with(".db") || current_href.ends_with(".db.gz"))
+                    {
                         // Extract filename from href
                         if let Some(start) = current_href.rfind('/') {
                             let filename = current_href[start + 1..].to_string();
@@ -3110,14 +3383,12 @@ pub async fn import_from_webdav(
     db: State<'_, SqlitePool>,
     filename: String,
 ) -> Result<()> {
-    use reqwest::Client;
-
     let settings = get_webdav_settings(db).await?;
     if settings.url.is_empty() {
         return Err("WebDAV URL not configured".to_string());
     }
 
-    let client = Client::new();
+    let client = webdav_client();
     let remote_file = format!(
         "{}/ccg-gateway-backup/{}",
         settings.url.trim_end_matches('/'),
@@ -3135,13 +3406,36 @@ pub async fn import_from_webdav(
         return Err(format!("Download failed with status: {}", response.status()));
     }
 
-    let content = response.bytes().await.map_err(|e| e.to_string())?;
-
-    // Write to database file
+    // 分块流式写入临时文件，避免整个备份驻留内存；下载完整后再覆盖数据库文件，
+    // 中途失败不会破坏现有数据库
     let db_path = get_data_dir().join("ccg_gateway.db");
+    let download_path = get_data_dir().join("ccg_gateway.db.download");
 
-    std::fs::write(&db_path, &content)
-        .map_err(|e| format!("Failed to write database: {}", e))?;
+    if let Err(e) = download_to_file(response, &download_path).await {
+        let _ = tokio::fs::remove_file(&download_path).await;
+        return Err(e);
+    }
+
+    // gzip 备份先解压到临时文件，解压失败同样不影响现有数据库
+    let restore_path = if filename.ends_with(".gz") {
+        let restore_path = get_data_dir().join("ccg_gateway.db.restore");
+        let unpacked = gunzip_backup(download_path.clone(), restore_path.clone()).await;
+        let _ = tokio::fs::remove_file(&download_path).await;
+        if let Err(e) = unpacked {
+            let _ = tokio::fs::remove_file(&restore_path).await;
+            return Err(e);
+        }
+        restore_path
+    } else {
+        download_path
+    };
+
+    // 使用 copy 而非 rename：数据库仍被连接池打开，Windows 上无法 rename 覆盖
+    let copied = tokio::fs::copy(&restore_path, &db_path)
+        .await
+        .map_err(|e| format!("Failed to write database: {}", e));
+    let _ = tokio::fs::remove_file(&restore_path).await;
+    copied?;
 
     // 退出应用，用户需手动重启
     exit_application().await?;
@@ -3149,19 +3443,71 @@ pub async fn import_from_webdav(
     Ok(())
 }
 
+/// gzip 压缩备份内容（CPU 密集，放到阻塞线程池执行）
+async fn gzip_backup(data: Vec<u8>) -> Result<Vec<u8>> {
+    use flate2::write::GzEncoder;
+    use flate2::Compression;
+    use std::io::Write;
+
+    tokio::task::spawn_blocking(move || {
+        let mut encoder = GzEncoder::new(Vec::with_capacity(data.len() / 3), Compression::new(3));
+        encoder.write_all(&data)?;
+        encoder.finish()
+    })
+    .await
+    .map_err(|e| e.to_string())?
+    .map_err(|e| format!("Failed to compress backup: {}", e))
+}
+
+/// 将 gzip 备份文件解压到目标路径
+async fn gunzip_backup(src: std::path::PathBuf, dst: std::path::PathBuf) -> Result<()> {
+    use flate2::read::GzDecoder;
+
+    tokio::task::spawn_blocking(move || -> std::io::Result<()> {
+        let mut decoder = GzDecoder::new(std::io::BufReader::new(std::fs::File::open(&src)?));
+        let mut output = std::fs::File::create(&dst)?;
+        std::io::copy(&mut decoder, &mut output)?;
+        Ok(())
+    })
+    .await
+    .map_err(|e| e.to_string())?
+    .map_err(|e| format!("Failed to decompress backup: {}", e))
+}
+
+/// 将响应体逐块写入指定文件
+async fn download_to_file(mut response: reqwest::Response, path: &std::path::Path) -> Result<()> {
+    use tokio::io::AsyncWriteExt;
+
+    let mut file = tokio::fs::File::create(path)
+        .await
+        .map_err(|e| format!("Failed to write database: {}", e))?;
+
+    while let Some(chunk) = response
+        .chunk()
+        .await
+        .map_err(|e| format!("Download failed: {}", e))?
+    {
+        file.write_all(&chunk)
+            .await
+            .map_err(|e| format!("Failed to write database: {}", e))?;
+    }
+
+    file.flush()
+        .await
+        .map_err(|e| format!("Failed to write database: {}", e))
+}
+
 #[tauri::command]
 pub async fn delete_webdav_backup(
     db: State<'_, SqlitePool>,
     filename: String,
 ) -> Result<()> {
-    use reqwest::Client;
-
     let settings = get_webdav_settings(db).await?;
     if settings.url.is_empty() {
         return Err("WebDAV URL not configured".to_string());
     }
 
-    let client = Client::new();
+    let client = webdav_client();
     let remote_file = format!(
         "{}/ccg-gateway-backup/{}",
         settings.url.trim_end_matches('/'),
@@ -1,5 +1,6 @@
 use serde::{Deserialize, Serialize};
 use std::path::PathBuf;
+use std::sync::OnceLock;
 
 #[derive(Debug, Clone, Serialize, Deserialize)]
 pub struct Config {
@@ -42,14 +43,26 @@ fn default_log_db_path() -> PathBuf {
     get_data_dir().join("ccg_logs.db")
 }
 
+/// Data directory, resolved once per process (env/home lookups don't change at runtime)
 pub fn get_data_dir() -> PathBuf {
+    static DATA_DIR: OnceLock<PathBuf> = OnceLock::new();
+    DATA_DIR.get_or_init(resolve_data_dir).clone()
+}
+
+/// User home directory, resolved once per process (used for all CLI config paths)
+pub fn get_home_dir() -> Option<PathBuf> {
+    static HOME_DIR: OnceLock<Option<PathBuf>> = OnceLock::new();
+    HOME_DIR.get_or_init(dirs::home_dir).clone()
+}
+
+fn resolve_data_dir() -> PathBuf {
     // Priority 1: Custom environment variable
     if let Ok(dir) = std::env::var("CCG_DATA_DIR") {
         return PathBuf::from(dir);
     }
 
     // Priority 2: User home directory (cross-platform consistent)
-    if let Some(home) = dirs::home_dir() {
+    if let Some(home) = get_home_dir() {
         return home.join(".ccg-gateway");
     }
 
@@ -8,8 +8,11 @@ use schema_definition::DatabaseSchema;
 use schema_diff::SchemaDiff;
 use schema_inspector::SchemaInspector;
 use schema_migrator::SchemaMigrator;
-use sqlx::sqlite::{SqlitePool, SqlitePoolOptions};
+use sqlx::sqlite::{
+    SqliteConnectOptions, SqliteJournalMode, SqlitePool, SqlitePoolOptions, SqliteSynchronous,
+};
 use std::path::Path;
+use std::str::FromStr;
 
 pub async fn init_db(path: &Path) -> Result<SqlitePool, sqlx::Error> {
     // 1. 确保父目录存在
@@ -17,16 +20,31 @@ pub async fn init_db(path: &Path) -> Result<SqlitePool, sqlx::Error> {
         std::fs::create_dir_all(parent).ok();
     }
 
-    // 2. 连接数据库
+    // 2. 判断数据库类型
+    let is_log_db = path.ends_with("ccg_logs.db") || path.ends_with("ccg_logs");
+
+    // 3. 连接数据库
     let db_url = format!("sqlite:{}?mode=rwc", path.display());
+    let mut options = SqliteConnectOptions::from_str(&db_url)?;
+    if is_log_db {
+        // 日志库写入频繁：WAL 让读写互不阻塞，NORMAL 同步在 WAL 下只在 checkpoint 时 fsync
+        // 主库保持默认回滚日志，导出/导入直接读写 db 文件，不能有未合并的 -wal 数据
+        options = options
+            .journal_mode(SqliteJournalMode::Wal)
+            .synchronous(SqliteSynchronous::Normal)
+            .pragma("temp_store", "MEMORY")
+            .pragma("mmap_size", "268435456")
+            .pragma("cache_size", "-65536");
+    }
+    // 连接常驻：避免空闲回收后在请求路径上重新打开文件、重放 PRAGMA
     let pool = SqlitePoolOptions::new()
         .max_connections(5)
-        .connect(&db_url)
+        .min_connections(1)
+        .idle_timeout(None)
+        .max_lifetime(None)
+        .connect_with(options)
         .await?;
 
-    // 3. 判断数据库类型
-    let is_log_db = path.ends_with("ccg_logs.db") || path.ends_with("ccg_logs");
-
     // 4. 获取期望的 schema
     let expected_schema = if is_log_db {
         DatabaseSchema::log_schema()
@@ -37,8 +55,12 @@ pub async fn init_db(path: &Path) -> Result<SqlitePool, sqlx::Error> {
     // 5. 创建检查器
     let inspector = SchemaInspector::new(&pool);
 
-    // 6. 检查是否是全新数据库
-    if inspector.is_empty_database().await? {
+    // 6. 读取版本号，版本表存在即说明不是全新数据库
+    // 启动时只查一次 sqlite_master，已是最新版本时不再做任何结构检查
+    let stored_version = inspector.read_version().await?;
+
+    // 7. 检查是否是全新数据库
+    if stored_version.is_none() && inspector.get_tables().await?.is_empty() {
         tracing::info!("检测到全新数据库，创建表结构...");
         create_fresh_database(&pool, &expected_schema).await?;
 
@@ -50,30 +72,30 @@ pub async fn init_db(path: &Path) -> Result<SqlitePool, sqlx::Error> {
         return Ok(pool);
     }
 
-    // 7. 检查版本
-    let current_version = inspector.get_version().await?;
+    // 8. 检查版本
+    let current_version = stored_version.unwrap_or(0);
     tracing::info!(
         "数据库当前版本: {}, 期望版本: {}",
         current_version,
         expected_schema.version
     );
 
-    // 8. 版本检查
+    // 9. 版本检查
     if current_version >= expected_schema.version {
         tracing::info!("数据库已是最新版本，跳过迁移");
         return Ok(pool);
     }
 
-    // 9. 需要迁移
+    // 10. 需要迁移
     tracing::info!("检测到数据库版本过旧，开始自动迁移...");
 
-    // 10. 读取实际结构
+    // 11. 读取实际结构
     let actual_tables = inspector.get_tables().await?;
 
-    // 11. 对比差异（通过 SQL 比较）
+    // 12. 对比差异（通过 SQL 比较）
     let diff = SchemaDiff::compare_async(&expected_schema, actual_tables, &inspector).await?;
 
-    // 12. 应用变更
+    // 13. 应用变更
     if diff.has_changes() {
         tracing::info!("检测到 {} 个结构变更，开始迁移...", diff.change_count());
         let migrator = SchemaMigrator::new(&pool, &expected_schema);
@@ -81,10 +103,13 @@ pub async fn init_db(path: &Path) -> Result<SqlitePool, sqlx::Error> {
         tracing::info!("数据库迁移完成");
     }
 
-    // 13. 更新版本
+    // 重建表会连带删除旧索引，迁移后统一补建
+    create_indexes(&pool, &expected_schema).await?;
+
+    // 14. 更新版本
     update_version(&pool, expected_schema.version).await?;
 
-    // 14. 插入默认数据（仅主数据库）
+    // 15. 插入默认数据（仅主数据库）
     if !is_log_db {
         init_default_data(&pool).await?;
     }
@@ -103,6 +128,9 @@ async fn create_fresh_database(
         sqlx::query(&sql).execute(pool).await?;
     }
 
+    // 创建索引
+    create_indexes(pool, schema).await?;
+
     // 创建版本表
     create_version_table(pool).await?;
 
@@ -113,6 +141,14 @@ async fn create_fresh_database(
     Ok(())
 }
 
+/// 创建索引（IF NOT EXISTS，可重复执行）
+async fn create_indexes(pool: &SqlitePool, schema: &DatabaseSchema) -> Result<(), sqlx::Error> {
+    for sql in schema.to_create_index_sql() {
+        sqlx::query(&sql).execute(pool).await?;
+    }
+    Ok(())
+}
+
 /// 创建版本表
 async fn create_version_table(pool: &SqlitePool) -> Result<(), sqlx::Error> {
     sqlx::query(
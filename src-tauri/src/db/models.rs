@@ -10,7 +10,7 @@ pub struct Provider {
     pub name: String,
     pub base_url: String,
     pub api_key: String,
-    pub enabled: i64,
+    pub enabled: bool,
     pub failure_threshold: i64,
     pub blacklist_minutes: i64,
     pub consecutive_failures: i64,
@@ -26,7 +26,7 @@ pub struct ProviderModelMap {
     pub provider_id: i64,
     pub source_model: String,
     pub target_model: String,
-    pub enabled: i64,
+    pub enabled: bool,
 }
 
 // Input DTOs
@@ -88,7 +88,13 @@ pub struct ProviderResponse {
 
 impl From<Provider> for ProviderResponse {
     fn from(p: Provider) -> Self {
-        let now = chrono::Utc::now().timestamp();
+        Self::from_provider(p, chrono::Utc::now().timestamp())
+    }
+}
+
+impl ProviderResponse {
+    /// 以给定时间戳判断拉黑状态，列表转换时只需取一次当前时间
+    pub fn from_provider(p: Provider, now: i64) -> Self {
         let is_blacklisted = p.blacklisted_until.map(|t| t > now).unwrap_or(false);
         Self {
             id: p.id,
@@ -96,7 +102,7 @@ impl From<Provider> for ProviderResponse {
             name: p.name,
             base_url: p.base_url,
             api_key: p.api_key,
-            enabled: p.enabled != 0,
+            enabled: p.enabled,
             failure_threshold: p.failure_threshold,
             blacklist_minutes: p.blacklist_minutes,
             consecutive_failures: p.consecutive_failures,
@@ -183,7 +189,7 @@ pub struct WebdavSettingsRow {
 }
 
 // WebDAV Settings (简化版 - 用于API响应)
-#[derive(Debug, Serialize, Deserialize, FromRow)]
+#[derive(Debug, Clone, Serialize, Deserialize, FromRow)]
 pub struct WebdavSettings {
     pub url: String,
     pub username: String,
@@ -303,8 +309,34 @@ pub struct RequestLogItem {
     pub client_path: String,
 }
 
+// Request Log Detail 数据库行（body 列为 gzip 压缩的 BLOB）
+#[derive(Debug, FromRow)]
+pub struct RequestLogDetailRow {
+    pub id: i64,
+    pub created_at: i64,
+    pub cli_type: String,
+    pub provider_name: String,
+    pub model_id: Option<String>,
+    pub status_code: Option<i64>,
+    pub elapsed_ms: i64,
+    pub input_tokens: i64,
+    pub output_tokens: i64,
+    pub client_method: String,
+    pub client_path: String,
+    pub client_headers: Option<Vec<u8>>,
+    pub client_body: Option<Vec<u8>>,
+    pub forward_url: Option<String>,
+    pub forward_headers: Option<Vec<u8>>,
+    pub forward_body: Option<Vec<u8>>,
+    pub provider_headers: Option<Vec<u8>>,
+    pub provider_body: Option<Vec<u8>>,
+    pub response_headers: Option<Vec<u8>>,
+    pub response_body: Option<Vec<u8>>,
+    pub error_message: Option<String>,
+}
+
 // Request Log Detail (详情视图)
-#[derive(Debug, Serialize, FromRow)]
+#[derive(Debug, Serialize)]
 pub struct RequestLogDetail {
     pub id: i64,
     pub created_at: i64,
@@ -329,6 +361,36 @@ pub struct RequestLogDetail {
     pub error_message: Option<String>,
 }
 
+impl From<RequestLogDetailRow> for RequestLogDetail {
+    fn from(row: RequestLogDetailRow) -> Self {
+        use crate::services::stats::decode_log_body;
+
+        Self {
+            id: row.id,
+            created_at: row.created_at,
+            cli_type: row.cli_type,
+            provider_name: row.provider_name,
+            model_id: row.model_id,
+            status_code: row.status_code,
+            elapsed_ms: row.elapsed_ms,
+            input_tokens: row.input_tokens,
+            output_tokens: row.output_tokens,
+            client_method: row.client_method,
+            client_path: row.client_path,
+            client_headers: decode_log_body(row.client_headers),
+            client_body: decode_log_body(row.client_body),
+            forward_url: row.forward_url,
+            forward_headers: decode_log_body(row.forward_headers),
+            forward_body: decode_log_body(row.forward_body),
+            provider_headers: decode_log_body(row.provider_headers),
+            provider_body: decode_log_body(row.provider_body),
+            response_headers: decode_log_body(row.response_headers),
+            response_body: decode_log_body(row.response_body),
+            error_message: row.error_message,
+        }
+    }
+}
+
 #[derive(Debug, Serialize)]
 pub struct PaginatedLogs {
     pub items: Vec<RequestLogItem>,
@@ -62,27 +62,58 @@ impl TableDefinition {
     }
 }
 
+/// 索引定义
+#[derive(Debug, Clone)]
+pub struct IndexDefinition {
+    pub name: String,
+    pub table: String,
+    pub columns: Vec<String>,
+}
+
+impl IndexDefinition {
+    fn new(name: &str, table: &str, columns: &[&str]) -> Self {
+        Self {
+            name: name.to_string(),
+            table: table.to_string(),
+            columns: columns.iter().map(|c| c.to_string()).collect(),
+        }
+    }
+
+    /// 生成 CREATE INDEX SQL
+    pub fn to_create_sql(&self) -> String {
+        format!(
+            "CREATE INDEX IF NOT EXISTS {} ON {} ({})",
+            self.name,
+            self.table,
+            self.columns.join(", ")
+        )
+    }
+}
+
 /// 数据库 Schema
 #[derive(Debug, Clone)]
 pub struct DatabaseSchema {
     pub version: i64,
     pub tables: HashMap<String, TableDefinition>,
+    pub indexes: Vec<IndexDefinition>,
 }
 
 impl DatabaseSchema {
     /// 获取当前主数据库 Schema
     pub fn current() -> Self {
         Self {
-            version: 2,
+            version: 3,
             tables: Self::define_main_tables(),
+            indexes: Self::define_main_indexes(),
         }
     }
 
     /// 获取日志数据库 Schema
     pub fn log_schema() -> Self {
         Self {
-            version: 1,
+            version: 4,
             tables: Self::define_log_tables(),
+            indexes: Self::define_log_indexes(),
         }
     }
 
@@ -91,6 +122,11 @@ impl DatabaseSchema {
         self.tables.values().map(|table| table.to_create_sql()).collect()
     }
 
+    /// 生成所有索引的 CREATE SQL
+    pub fn to_create_index_sql(&self) -> Vec<String> {
+        self.indexes.iter().map(|index| index.to_create_sql()).collect()
+    }
+
     /// 定义主数据库表
     fn define_main_tables() -> HashMap<String, TableDefinition> {
         let mut tables = HashMap::new();
@@ -539,13 +575,13 @@ impl DatabaseSchema {
                     },
                     ColumnDefinition {
                         name: "client_headers".to_string(),
-                        data_type: "TEXT".to_string(),
+                        data_type: "BLOB".to_string(),
                         nullable: true,
                         default_value: None,
                     },
                     ColumnDefinition {
                         name: "client_body".to_string(),
-                        data_type: "TEXT".to_string(),
+                        data_type: "BLOB".to_string(),
                         nullable: true,
                         default_value: None,
                     },
@@ -557,37 +593,37 @@ impl DatabaseSchema {
                     },
                     ColumnDefinition {
                         name: "forward_headers".to_string(),
-                        data_type: "TEXT".to_string(),
+                        data_type: "BLOB".to_string(),
                         nullable: true,
                         default_value: None,
                     },
                     ColumnDefinition {
                         name: "forward_body".to_string(),
-                        data_type: "TEXT".to_string(),
+                        data_type: "BLOB".to_string(),
                         nullable: true,
                         default_value: None,
                     },
                     ColumnDefinition {
                         name: "provider_headers".to_string(),
-                        data_type: "TEXT".to_string(),
+                        data_type: "BLOB".to_string(),
                         nullable: true,
                         default_value: None,
                     },
                     ColumnDefinition {
                         name: "provider_body".to_string(),
-                        data_type: "TEXT".to_string(),
+                        data_type: "BLOB".to_string(),
                         nullable: true,
                         default_value: None,
                     },
                     ColumnDefinition {
                         name: "response_headers".to_string(),
-                        data_type: "TEXT".to_string(),
+                        data_type: "BLOB".to_string(),
                         nullable: true,
                         default_value: None,
                     },
                     ColumnDefinition {
                         name: "response_body".to_string(),
-                        data_type: "TEXT".to_string(),
+                        data_type: "BLOB".to_string(),
                         nullable: true,
                         default_value: None,
                     },
@@ -723,4 +759,25 @@ impl DatabaseSchema {
 
         tables
     }
+
+    /// 定义主数据库索引
+    /// provider_model_map 的 UNIQUE(provider_id, source_model) 已覆盖按 provider_id 的查找
+    fn define_main_indexes() -> Vec<IndexDefinition> {
+        vec![
+            // 按 cli_type 过滤并按 sort_order, id 排序，免去临时排序
+            IndexDefinition::new("idx_providers_cli_type_sort_order", "providers", &["cli_type", "sort_order"]),
+        ]
+    }
+
+    /// 定义日志数据库索引
+    /// 列表按 id 倒序分页，单列索引自带 rowid，过滤后可直接按 id 顺序扫描
+    fn define_log_indexes() -> Vec<IndexDefinition> {
+        vec![
+            IndexDefinition::new("idx_request_logs_cli_type", "request_logs", &["cli_type"]),
+            IndexDefinition::new("idx_request_logs_created_at", "request_logs", &["created_at"]),
+            IndexDefinition::new("idx_system_logs_level", "system_logs", &["level"]),
+            IndexDefinition::new("idx_system_logs_event_type", "system_logs", &["event_type"]),
+            IndexDefinition::new("idx_system_logs_provider_name", "system_logs", &["provider_name"]),
+        ]
+    }
 }
@@ -21,9 +21,9 @@ impl<'a> SchemaInspector<'a> {
         Self { pool }
     }
 
-    /// 获取数据库版本
-    /// 如果版本表不存在或没有记录，返回 0
-    pub async fn get_version(&self) -> Result<i64, sqlx::Error> {
+    /// 读取版本表中的版本号
+    /// 版本表不存在返回 None，存在但没有记录返回 Some(0)
+    pub async fn read_version(&self) -> Result<Option<i64>, sqlx::Error> {
         // 检查版本表是否存在
         let has_version_table: Option<(String,)> = sqlx::query_as(
             "SELECT name FROM sqlite_master WHERE type='table' AND name='_schema_version'",
@@ -32,7 +32,7 @@ impl<'a> SchemaInspector<'a> {
         .await?;
 
         if has_version_table.is_none() {
-            return Ok(0); // 版本表不存在，视为版本 0
+            return Ok(None);
         }
 
         // 读取版本号
@@ -41,20 +41,20 @@ impl<'a> SchemaInspector<'a> {
                 .fetch_optional(self.pool)
                 .await?;
 
-        Ok(version.map(|v| v.0).unwrap_or(0))
+        Ok(Some(version.map(|v| v.0).unwrap_or(0)))
+    }
+
+    /// 获取数据库版本
+    /// 如果版本表不存在或没有记录，返回 0
+    pub async fn get_version(&self) -> Result<i64, sqlx::Error> {
+        Ok(self.read_version().await?.unwrap_or(0))
     }
 
     /// 检查是否是全新数据库（没有任何用户表）
     pub async fn is_empty_database(&self) -> Result<bool, sqlx::Error> {
-        // 检查是否有版本表，如果有说明不是全新数据库
-        let has_version_table: Option<(String,)> = sqlx::query_as(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='_schema_version'",
-        )
-        .fetch_optional(self.pool)
-        .await?;
-
-        if has_version_table.is_some() {
-            return Ok(false); // 版本表存在，不是全新数据库
+        // 版本表存在，不是全新数据库
+        if self.read_version().await?.is_some() {
+            return Ok(false);
         }
 
         // 检查是否有其他用户表
@@ -47,6 +47,10 @@ pub fn run() {
                     .await
                     .expect("Failed to init log database");
 
+                if let Err(e) = services::stats::load_log_detail_setting(&db).await {
+                    tracing::warn!(error = %e, "Failed to load debug_log setting");
+                }
+
                 app.manage(db.clone());
                 app.manage(LogDb(log_db.clone()));
                 app.manage(StartTime(start_time));
@@ -55,6 +59,8 @@ pub fn run() {
                 let state = api::AppState {
                     db: db.clone(),
                     log_db: log_db.clone(),
+                    log_writer: services::stats::LogWriter::spawn(log_db.clone()),
+                    http_client: services::proxy::build_http_client(),
                 };
 
                 let router = api::create_router(state);
@@ -1,4 +1,4 @@
-use sqlx::SqlitePool;
+use sqlx::{QueryBuilder, Sqlite, SqlitePool};
 
 /// Record a successful request for a provider
 /// Resets consecutive_failures to 0
@@ -6,30 +6,22 @@ use sqlx::SqlitePool;
 pub async fn record_success(db: &SqlitePool, provider_id: i64) -> Result<bool, sqlx::Error> {
     let now = chrono::Utc::now().timestamp();
 
-    // Check if provider had previous failures
-    let had_failures: Option<(i64,)> = sqlx::query_as(
-        "SELECT consecutive_failures FROM providers WHERE id = ?",
-    )
-    .bind(provider_id)
-    .fetch_optional(db)
-    .await?;
-
-    let had_previous_failures = had_failures.map(|(cf,)| cf > 0).unwrap_or(false);
-
-    sqlx::query(
+    // 只在存在失败计数时才写：返回一行即说明之前有失败，正常情况下不产生写入
+    let recovered = sqlx::query(
         r#"
         UPDATE providers
         SET consecutive_failures = 0,
             updated_at = ?
-        WHERE id = ?
+        WHERE id = ? AND consecutive_failures > 0
+        RETURNING id
         "#,
     )
     .bind(now)
     .bind(provider_id)
-    .execute(db)
+    .fetch_optional(db)
     .await?;
 
-    Ok(had_previous_failures)
+    Ok(recovered.is_some())
 }
 
 /// Record a failed request for a provider
@@ -38,38 +30,35 @@ pub async fn record_success(db: &SqlitePool, provider_id: i64) -> Result<bool, s
 pub async fn record_failure(db: &SqlitePool, provider_id: i64) -> Result<(bool, String), sqlx::Error> {
     let now = chrono::Utc::now().timestamp();
 
-    // Get current provider state including name
-    let provider: Option<(i64, i64, i64, String)> = sqlx::query_as(
-        "SELECT consecutive_failures, failure_threshold, blacklist_minutes, name FROM providers WHERE id = ?",
+    // 单条 UPDATE 完成计数与拉黑判断：SET 中引用的是更新前的值，RETURNING 返回更新后的值
+    // 并发失败由 SQLite 写锁串行化，不会丢失计数
+    let updated: Option<(String, i64, i64, Option<i64>)> = sqlx::query_as(
+        r#"
+        UPDATE providers
+        SET consecutive_failures = consecutive_failures + 1,
+            blacklisted_until = CASE
+                WHEN consecutive_failures + 1 >= failure_threshold THEN ? + blacklist_minutes * 60
+                ELSE blacklisted_until
+            END,
+            updated_at = ?
+        WHERE id = ?
+        RETURNING name, consecutive_failures, failure_threshold, blacklisted_until
+        "#,
     )
+    .bind(now)
+    .bind(now)
     .bind(provider_id)
     .fetch_optional(db)
     .await?;
 
-    let Some((consecutive_failures, failure_threshold, blacklist_minutes, provider_name)) = provider else {
+    let Some((provider_name, new_failures, failure_threshold, blacklist_until)) = updated else {
         return Ok((false, String::new()));
     };
 
-    let new_failures = consecutive_failures + 1;
-
     // Check if we should blacklist
-    let was_blacklisted = if new_failures >= failure_threshold {
-        let blacklist_until = now + (blacklist_minutes * 60);
-        sqlx::query(
-            r#"
-            UPDATE providers
-            SET consecutive_failures = ?,
-                blacklisted_until = ?,
-                updated_at = ?
-            WHERE id = ?
-            "#,
-        )
-        .bind(new_failures)
-        .bind(blacklist_until)
-        .bind(now)
-        .bind(provider_id)
-        .execute(db)
-        .await?;
+    let was_blacklisted = new_failures >= failure_threshold;
+    if was_blacklisted {
+        crate::services::routing::invalidate_cache();
 
         tracing::warn!(
             provider_id = provider_id,
@@ -77,23 +66,7 @@ pub async fn record_failure(db: &SqlitePool, provider_id: i64) -> Result<(bool,
             blacklist_until = blacklist_until,
             "Provider blacklisted due to consecutive failures"
         );
-        true
-    } else {
-        sqlx::query(
-            r#"
-            UPDATE providers
-            SET consecutive_failures = ?,
-                updated_at = ?
-            WHERE id = ?
-            "#,
-        )
-        .bind(new_failures)
-        .bind(now)
-        .bind(provider_id)
-        .execute(db)
-        .await?;
-        false
-    };
+    }
 
     Ok((was_blacklisted, provider_name))
 }
@@ -116,5 +89,29 @@ pub async fn reset_failures(db: &SqlitePool, provider_id: i64) -> Result<(), sql
     .execute(db)
     .await?;
 
+    crate::services::routing::invalidate_cache();
+    Ok(())
+}
+
+/// Set sort_order of the given providers to their position in `ids`
+/// in a single UPDATE (CASE id WHEN ... THEN ...) instead of one statement per provider
+pub async fn reorder_providers(db: &SqlitePool, ids: &[i64]) -> Result<(), sqlx::Error> {
+    if ids.is_empty() {
+        return Ok(());
+    }
+
+    let mut query: QueryBuilder<Sqlite> = QueryBuilder::new("UPDATE providers SET sort_order = CASE id");
+    for (idx, id) in ids.iter().enumerate() {
+        query.push(" WHEN ").push_bind(*id).push(" THEN ").push_bind(idx as i64);
+    }
+    query.push(" END WHERE id IN (");
+    let mut in_list = query.separated(", ");
+    for id in ids {
+        in_list.push_bind(*id);
+    }
+    in_list.push_unseparated(")");
+    query.build().execute(db).await?;
+
+    crate::services::routing::invalidate_cache();
     Ok(())
 }
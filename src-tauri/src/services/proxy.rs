@@ -1,6 +1,7 @@
 use axum::http::HeaderMap;
 use regex::Regex;
 use serde_json::Value;
+use std::sync::OnceLock;
 use std::time::Duration;
 
 use crate::db::models::ProviderModelMap;
@@ -187,7 +188,8 @@ pub fn apply_url_model_mapping(
     };
 
     // Extract model from Gemini path: /v1beta/models/{model}:generateContent
-    let re = Regex::new(r"/models/([^/:]+)").unwrap();
+    static MODEL_PATH_RE: OnceLock<Regex> = OnceLock::new();
+    let re = MODEL_PATH_RE.get_or_init(|| Regex::new(r"/models/([^/:]+)").unwrap());
     let Some(caps) = re.captures(path) else {
         return result;
     };
@@ -399,6 +401,22 @@ pub fn build_upstream_url(base_url: &str, path: &str, cli_type: CliType) -> Stri
     }
 }
 
+/// Build the upstream HTTP client shared by all proxied requests.
+/// Reusing one client keeps the connection pool (and TLS sessions) warm
+/// across requests; per-request timeouts are still applied by the handlers.
+pub fn build_http_client() -> reqwest::Client {
+    reqwest::Client::builder()
+        .pool_idle_timeout(Duration::from_secs(90))
+        .pool_max_idle_per_host(32)
+        .tcp_keepalive(Duration::from_secs(60))
+        .tcp_nodelay(true)
+        .build()
+        .unwrap_or_else(|e| {
+            tracing::warn!(error = %e, "Failed to build HTTP client, using defaults");
+            reqwest::Client::new()
+        })
+}
+
 /// Timeout configuration
 #[derive(Debug, Clone)]
 pub struct TimeoutConfig {
@@ -1,4 +1,7 @@
 use sqlx::SqlitePool;
+use std::collections::HashMap;
+use std::sync::atomic::{AtomicU64, Ordering};
+use std::sync::{Arc, OnceLock, RwLock};
 
 use crate::db::models::{Provider, ProviderModelMap};
 
@@ -9,76 +12,125 @@ pub struct ProviderWithMaps {
     pub model_maps: Vec<ProviderModelMap>,
 }
 
-/// Select an available provider for the given CLI type
-/// Returns None if all providers are blacklisted or none are configured
-pub async fn select_provider(
+type ProviderCache = RwLock<HashMap<String, Arc<Vec<ProviderWithMaps>>>>;
+
+/// Enabled providers per CLI type, in routing order.
+/// Blacklist expiry is checked at selection time, so entries only need to be
+/// dropped when provider rows or model maps change (see [`invalidate_cache`]).
+fn provider_cache() -> &'static ProviderCache {
+    static CACHE: OnceLock<ProviderCache> = OnceLock::new();
+    CACHE.get_or_init(|| RwLock::new(HashMap::new()))
+}
+
+/// Bumped on every invalidation so a load that raced with a write is not cached
+static CACHE_GENERATION: AtomicU64 = AtomicU64::new(0);
+
+/// Drop cached routing data.
+/// Must be called after any write to providers / provider_model_map that
+/// affects routing (CRUD, reorder, blacklist set or reset).
+pub fn invalidate_cache() {
+    CACHE_GENERATION.fetch_add(1, Ordering::SeqCst);
+    if let Ok(mut cache) = provider_cache().write() {
+        cache.clear();
+    }
+}
+
+/// Load enabled providers (with enabled model maps) for a CLI type, cached per process
+async fn load_enabled_providers(
     db: &SqlitePool,
     cli_type: &str,
-) -> Result<Option<ProviderWithMaps>, sqlx::Error> {
-    let now = chrono::Utc::now().timestamp();
+) -> Result<Arc<Vec<ProviderWithMaps>>, sqlx::Error> {
+    if let Some(cached) = provider_cache()
+        .read()
+        .ok()
+        .and_then(|cache| cache.get(cli_type).cloned())
+    {
+        return Ok(cached);
+    }
+
+    let generation = CACHE_GENERATION.load(Ordering::SeqCst);
 
-    // Query enabled providers ordered by sort_order, excluding blacklisted ones
     let providers = sqlx::query_as::<_, Provider>(
         r#"
         SELECT * FROM providers
         WHERE cli_type = ?
           AND enabled = 1
-          AND (blacklisted_until IS NULL OR blacklisted_until <= ?)
         ORDER BY sort_order, id
         "#,
     )
     .bind(cli_type)
-    .bind(now)
     .fetch_all(db)
     .await?;
 
-    // Return the first available provider with its model maps
-    if let Some(provider) = providers.into_iter().next() {
-        let model_maps = sqlx::query_as::<_, ProviderModelMap>(
-            "SELECT * FROM provider_model_map WHERE provider_id = ? AND enabled = 1 ORDER BY id",
-        )
-        .bind(provider.id)
-        .fetch_all(db)
-        .await?;
-
-        Ok(Some(ProviderWithMaps { provider, model_maps }))
-    } else {
-        Ok(None)
-    }
-}
-
-/// Get all available providers for a CLI type (for fallback scenarios)
-pub async fn get_available_providers(
-    db: &SqlitePool,
-    cli_type: &str,
-) -> Result<Vec<ProviderWithMaps>, sqlx::Error> {
-    let now = chrono::Utc::now().timestamp();
-
-    let providers = sqlx::query_as::<_, Provider>(
+    // 该 CLI 下所有启用的映射一次取回，按 provider_id 分组
+    let model_maps = sqlx::query_as::<_, ProviderModelMap>(
         r#"
-        SELECT * FROM providers
-        WHERE cli_type = ?
-          AND enabled = 1
-          AND (blacklisted_until IS NULL OR blacklisted_until <= ?)
-        ORDER BY sort_order, id
+        SELECT m.* FROM provider_model_map m
+        JOIN providers p ON p.id = m.provider_id
+        WHERE p.cli_type = ?
+          AND p.enabled = 1
+          AND m.enabled = 1
+        ORDER BY m.id
         "#,
     )
     .bind(cli_type)
-    .bind(now)
     .fetch_all(db)
     .await?;
 
-    let mut result = Vec::new();
-    for provider in providers {
-        let model_maps = sqlx::query_as::<_, ProviderModelMap>(
-            "SELECT * FROM provider_model_map WHERE provider_id = ? AND enabled = 1 ORDER BY id",
-        )
-        .bind(provider.id)
-        .fetch_all(db)
-        .await?;
+    let mut maps_by_provider: HashMap<i64, Vec<ProviderModelMap>> = HashMap::new();
+    for map in model_maps {
+        maps_by_provider.entry(map.provider_id).or_default().push(map);
+    }
 
-        result.push(ProviderWithMaps { provider, model_maps });
+    let result: Vec<ProviderWithMaps> = providers
+        .into_iter()
+        .map(|provider| {
+            let model_maps = maps_by_provider.remove(&provider.id).unwrap_or_default();
+            ProviderWithMaps { provider, model_maps }
+        })
+        .collect();
+
+    let result = Arc::new(result);
+    if let Ok(mut cache) = provider_cache().write() {
+        if CACHE_GENERATION.load(Ordering::SeqCst) == generation {
+            cache.insert(cli_type.to_string(), result.clone());
+        }
     }
 
     Ok(result)
 }
+
+fn is_available(provider: &Provider, now: i64) -> bool {
+    provider.blacklisted_until.map(|t| t <= now).unwrap_or(true)
+}
+
+/// Select an available provider for the given CLI type
+/// Returns None if all providers are blacklisted or none are configured
+pub async fn select_provider(
+    db: &SqlitePool,
+    cli_type: &str,
+) -> Result<Option<ProviderWithMaps>, sqlx::Error> {
+    let now = chrono::Utc::now().timestamp();
+    let providers = load_enabled_providers(db, cli_type).await?;
+
+    // Return the first available provider with its model maps
+    Ok(providers
+        .iter()
+        .find(|p| is_available(&p.provider, now))
+        .cloned())
+}
+
+/// Get all available providers for a CLI type (for fallback scenarios)
+pub async fn get_available_providers(
+    db: &SqlitePool,
+    cli_type: &str,
+) -> Result<Vec<ProviderWithMaps>, sqlx::Error> {
+    let now = chrono::Utc::now().timestamp();
+    let providers = load_enabled_providers(db, cli_type).await?;
+
+    Ok(providers
+        .iter()
+        .filter(|p| is_available(&p.provider, now))
+        .cloned()
+        .collect())
+}
@@ -1,39 +1,38 @@
-use sqlx::SqlitePool;
+use flate2::read::GzDecoder;
+use flate2::write::GzEncoder;
+use flate2::Compression;
+use sqlx::{QueryBuilder, Sqlite, SqlitePool};
+use std::collections::HashMap;
+use std::io::{Read, Write};
+use std::sync::atomic::{AtomicBool, AtomicU64, Ordering};
+use std::sync::{OnceLock, RwLock};
+use std::time::{Duration, Instant};
+use tokio::sync::mpsc;
 
-/// Record a request in the daily usage statistics
-pub async fn record_request(
-    log_db: &SqlitePool,
-    provider_name: &str,
-    cli_type: &str,
-    success: bool,
-    input_tokens: i64,
-    output_tokens: i64,
-) -> Result<(), sqlx::Error> {
-    let today = chrono::Utc::now().format("%Y-%m-%d").to_string();
+/// Max rows written per transaction by the log writer
+const LOG_BATCH_SIZE: usize = 100;
+/// Pending rows kept in memory before new entries are dropped
+const LOG_QUEUE_CAPACITY: usize = 10_000;
 
-    // Upsert into usage_daily table
-    sqlx::query(
-        r#"
-        INSERT INTO usage_daily (usage_date, provider_name, cli_type, request_count, success_count, failure_count, input_tokens, output_tokens)
-        VALUES (?, ?, ?, 1, ?, ?, ?, ?)
-        ON CONFLICT(usage_date, provider_name, cli_type) DO UPDATE SET
-            request_count = request_count + 1,
-            success_count = success_count + excluded.success_count,
-            failure_count = failure_count + excluded.failure_count,
-            input_tokens = input_tokens + excluded.input_tokens,
-            output_tokens = output_tokens + excluded.output_tokens
-        "#,
-    )
-    .bind(&today)
-    .bind(provider_name)
-    .bind(cli_type)
-    .bind(if success { 1 } else { 0 })
-    .bind(if success { 0 } else { 1 })
-    .bind(input_tokens)
-    .bind(output_tokens)
-    .execute(log_db)
-    .await?;
+/// Whether request logs keep headers and bodies (gateway_settings.debug_log).
+/// Cached in memory so the proxy path never queries the setting; refreshed
+/// at startup and whenever the setting is updated.
+static LOG_DETAIL_ENABLED: AtomicBool = AtomicBool::new(false);
 
+pub fn log_detail_enabled() -> bool {
+    LOG_DETAIL_ENABLED.load(Ordering::Relaxed)
+}
+
+pub fn set_log_detail_enabled(enabled: bool) {
+    LOG_DETAIL_ENABLED.store(enabled, Ordering::Relaxed);
+}
+
+/// Load the debug_log setting into the in-memory flag
+pub async fn load_log_detail_setting(db: &SqlitePool) -> Result<(), sqlx::Error> {
+    let debug_log: Option<(i64,)> = sqlx::query_as("SELECT debug_log FROM gateway_settings WHERE id = 1")
+        .fetch_optional(db)
+        .await?;
+    set_log_detail_enabled(debug_log.map(|(v,)| v != 0).unwrap_or(false));
     Ok(())
 }
 
@@ -52,52 +51,264 @@ pub struct RequestLogInfo {
     pub error_message: Option<String>,
 }
 
-/// Record a request log entry
-pub async fn record_request_log(
+/// A finished request waiting to be written to request_logs / usage_daily
+pub struct RequestLogEntry {
+    pub created_at: i64,
+    pub cli_type: String,
+    pub provider_name: String,
+    pub model_id: Option<String>,
+    pub status_code: Option<u16>,
+    pub elapsed_ms: i64,
+    pub input_tokens: i64,
+    pub output_tokens: i64,
+    pub client_method: String,
+    pub client_path: String,
+    pub info: RequestLogInfo,
+}
+
+/// A system event waiting to be written to system_logs
+struct SystemLogEntry {
+    created_at: i64,
+    level: String,
+    event_type: String,
+    message: String,
+    provider_name: Option<String>,
+    details: Option<String>,
+}
+
+enum LogEntry {
+    Request(RequestLogEntry),
+    System(SystemLogEntry),
+}
+
+impl RequestLogEntry {
+    fn success(&self) -> bool {
+        // 200-299 = success
+        self.status_code
+            .map(|code| (200..300).contains(&code))
+            .unwrap_or(false)
+    }
+}
+
+/// Background writer for request and system logs.
+///
+/// Requests only enqueue their log entry; a single task drains the queue and
+/// writes everything that has piled up in one transaction, so the commit
+/// cost is shared by all requests that finished in the meantime.
+#[derive(Clone)]
+pub struct LogWriter {
+    tx: mpsc::Sender<LogEntry>,
+}
+
+impl LogWriter {
+    /// Start the writer task on the current tokio runtime
+    pub fn spawn(log_db: SqlitePool) -> Self {
+        let (tx, mut rx) = mpsc::channel::<LogEntry>(LOG_QUEUE_CAPACITY);
+
+        tokio::spawn(async move {
+            let mut batch = Vec::with_capacity(LOG_BATCH_SIZE);
+            let mut requests = Vec::with_capacity(LOG_BATCH_SIZE);
+            let mut system = Vec::new();
+            // recv_many 至少等到一条，然后一次取走队列中已积压的条目
+            while rx.recv_many(&mut batch, LOG_BATCH_SIZE).await > 0 {
+                for entry in batch.drain(..) {
+                    match entry {
+                        LogEntry::Request(e) => requests.push(e),
+                        LogEntry::System(e) => system.push(e),
+                    }
+                }
+                if let Err(e) = record_request_batch(&log_db, &requests).await {
+                    tracing::error!(error = %e, count = requests.len(), "Failed to write request logs");
+                }
+                if let Err(e) = record_system_batch(&log_db, &system).await {
+                    tracing::error!(error = %e, count = system.len(), "Failed to write system logs");
+                }
+                requests.clear();
+                system.clear();
+            }
+        });
+
+        Self { tx }
+    }
+
+    /// Queue a log entry without waiting for the database
+    pub fn record(&self, entry: RequestLogEntry) {
+        if let Err(e) = self.tx.try_send(LogEntry::Request(entry)) {
+            tracing::warn!(error = %e, "Request log queue full, dropping entry");
+        }
+    }
+
+    /// Queue a system log entry without waiting for the database
+    pub fn record_system(
+        &self,
+        level: &str,
+        event_type: &str,
+        message: &str,
+        provider_name: Option<&str>,
+        details: Option<&str>,
+    ) {
+        let entry = SystemLogEntry {
+            created_at: chrono::Utc::now().timestamp(),
+            level: level.to_string(),
+            event_type: event_type.to_string(),
+            message: message.to_string(),
+            provider_name: provider_name.map(|s| s.to_string()),
+            details: details.map(|s| s.to_string()),
+        };
+        if let Err(e) = self.tx.try_send(LogEntry::System(entry)) {
+            tracing::warn!(error = %e, "Log queue full, dropping system log entry");
+        }
+    }
+}
+
+/// Compress a logged body or header JSON for storage in a BLOB column
+pub fn encode_log_body(body: Option<&str>) -> Option<Vec<u8>> {
+    let body = body?;
+    let mut encoder = GzEncoder::new(Vec::with_capacity(body.len() / 4), Compression::fast());
+    if encoder.write_all(body.as_bytes()).is_err() {
+        return Some(body.as_bytes().to_vec());
+    }
+    Some(encoder.finish().unwrap_or_else(|_| body.as_bytes().to_vec()))
+}
+
+/// Decode a logged body; rows written before compression are returned as-is
+pub fn decode_log_body(data: Option<Vec<u8>>) -> Option<String> {
+    let data = data?;
+    // gzip magic: 0x1f 0x8b
+    if data.starts_with(&[0x1f, 0x8b]) {
+        let mut decoded = String::new();
+        if GzDecoder::new(data.as_slice()).read_to_string(&mut decoded).is_ok() {
+            return Some(decoded);
+        }
+    }
+    Some(String::from_utf8_lossy(&data).into_owned())
+}
+
+/// Write a batch of request logs and their daily usage in one transaction
+pub async fn record_request_batch(
     log_db: &SqlitePool,
-    cli_type: &str,
-    provider_name: &str,
-    model_id: Option<&str>,
-    status_code: Option<u16>,
-    elapsed_ms: i64,
-    input_tokens: i64,
-    output_tokens: i64,
-    client_method: &str,
-    client_path: &str,
-    info: Option<RequestLogInfo>,
+    entries: &[RequestLogEntry],
 ) -> Result<(), sqlx::Error> {
-    let now = chrono::Utc::now().timestamp();
-    let info = info.unwrap_or_default();
+    if entries.is_empty() {
+        return Ok(());
+    }
 
-    sqlx::query(
-        r#"
-        INSERT INTO request_logs (created_at, cli_type, provider_name, model_id, status_code, elapsed_ms, input_tokens, output_tokens, client_method, client_path, client_headers, client_body, forward_url, forward_headers, forward_body, provider_headers, provider_body, response_headers, response_body, error_message)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        "#,
-    )
-    .bind(now)
-    .bind(cli_type)
-    .bind(provider_name)
-    .bind(model_id)
-    .bind(status_code.map(|c| c as i64))
-    .bind(elapsed_ms)
-    .bind(input_tokens)
-    .bind(output_tokens)
-    .bind(client_method)
-    .bind(client_path)
-    .bind(&info.client_headers)
-    .bind(&info.client_body)
-    .bind(&info.forward_url)
-    .bind(&info.forward_headers)
-    .bind(&info.forward_body)
-    .bind(&info.provider_headers)
-    .bind(&info.provider_body)
-    .bind(&info.response_headers)
-    .bind(&info.response_body)
-    .bind(&info.error_message)
-    .execute(log_db)
-    .await?;
+    let mut tx = log_db.begin().await?;
+
+    // 压缩放在写入任务里做，不占用请求路径；请求头 JSON 与请求体一样按 gzip 存储
+    // 顺序：client/forward/provider/response 的 (headers, body)
+    let encoded: Vec<[Option<Vec<u8>>; 8]> = entries
+        .iter()
+        .map(|e| {
+            [
+                encode_log_body(e.info.client_headers.as_deref()),
+                encode_log_body(e.info.client_body.as_deref()),
+                encode_log_body(e.info.forward_headers.as_deref()),
+                encode_log_body(e.info.forward_body.as_deref()),
+                encode_log_body(e.info.provider_headers.as_deref()),
+                encode_log_body(e.info.provider_body.as_deref()),
+                encode_log_body(e.info.response_headers.as_deref()),
+                encode_log_body(e.info.response_body.as_deref()),
+            ]
+        })
+        .collect();
+
+    let mut insert: QueryBuilder<Sqlite> = QueryBuilder::new(
+        "INSERT INTO request_logs (created_at, cli_type, provider_name, model_id, status_code, elapsed_ms, input_tokens, output_tokens, client_method, client_path, client_headers, client_body, forward_url, forward_headers, forward_body, provider_headers, provider_body, response_headers, response_body, error_message) ",
+    );
+    insert.push_values(entries.iter().zip(&encoded), |mut row, (e, encoded)| {
+        row.push_bind(e.created_at)
+            .push_bind(e.cli_type.as_str())
+            .push_bind(e.provider_name.as_str())
+            .push_bind(e.model_id.as_deref())
+            .push_bind(e.status_code.map(|c| c as i64))
+            .push_bind(e.elapsed_ms)
+            .push_bind(e.input_tokens)
+            .push_bind(e.output_tokens)
+            .push_bind(e.client_method.as_str())
+            .push_bind(e.client_path.as_str())
+            .push_bind(encoded[0].as_deref())
+            .push_bind(encoded[1].as_deref())
+            .push_bind(e.info.forward_url.as_deref())
+            .push_bind(encoded[2].as_deref())
+            .push_bind(encoded[3].as_deref())
+            .push_bind(encoded[4].as_deref())
+            .push_bind(encoded[5].as_deref())
+            .push_bind(encoded[6].as_deref())
+            .push_bind(encoded[7].as_deref())
+            .push_bind(e.info.error_message.as_deref());
+    });
+    insert.build().execute(&mut *tx).await?;
+
+    // 按 (日期, provider, cli) 聚合后再 upsert usage_daily
+    // value: (request_count, success_count, failure_count, input_tokens, output_tokens)
+    let mut usage: HashMap<(String, &str, &str), (i64, i64, i64, i64, i64)> = HashMap::new();
+    for e in entries {
+        let usage_date = chrono::DateTime::from_timestamp(e.created_at, 0)
+            .unwrap_or_else(chrono::Utc::now)
+            .format("%Y-%m-%d")
+            .to_string();
+        let success = e.success();
+        let counts = usage
+            .entry((usage_date, e.provider_name.as_str(), e.cli_type.as_str()))
+            .or_default();
+        counts.0 += 1;
+        counts.1 += if success { 1 } else { 0 };
+        counts.2 += if success { 0 } else { 1 };
+        counts.3 += e.input_tokens;
+        counts.4 += e.output_tokens;
+    }
+
+    for ((usage_date, provider_name, cli_type), counts) in usage {
+        sqlx::query(
+            r#"
+            INSERT INTO usage_daily (usage_date, provider_name, cli_type, request_count, success_count, failure_count, input_tokens, output_tokens)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(usage_date, provider_name, cli_type) DO UPDATE SET
+                request_count = request_count + excluded.request_count,
+                success_count = success_count + excluded.success_count,
+                failure_count = failure_count + excluded.failure_count,
+                input_tokens = input_tokens + excluded.input_tokens,
+                output_tokens = output_tokens + excluded.output_tokens
+            "#,
+        )
+        .bind(&usage_date)
+        .bind(provider_name)
+        .bind(cli_type)
+        .bind(counts.0)
+        .bind(counts.1)
+        .bind(counts.2)
+        .bind(counts.3)
+        .bind(counts.4)
+        .execute(&mut *tx)
+        .await?;
+    }
+
+    tx.commit().await?;
+    Ok(())
+}
+
+/// Write a batch of queued system logs with one multi-row INSERT
+async fn record_system_batch(
+    log_db: &SqlitePool,
+    entries: &[SystemLogEntry],
+) -> Result<(), sqlx::Error> {
+    if entries.is_empty() {
+        return Ok(());
+    }
 
+    let mut insert: QueryBuilder<Sqlite> = QueryBuilder::new(
+        "INSERT INTO system_logs (created_at, level, event_type, message, provider_name, details) ",
+    );
+    insert.push_values(entries, |mut row, e| {
+        row.push_bind(e.created_at)
+            .push_bind(e.level.as_str())
+            .push_bind(e.event_type.as_str())
+            .push_bind(e.message.as_str())
+            .push_bind(e.provider_name.as_deref())
+            .push_bind(e.details.as_deref());
+    });
+    insert.build().execute(log_db).await?;
     Ok(())
 }
 
@@ -135,3 +346,93 @@ pub fn create_log_details(data: &serde_json::Value) -> String {
     data.to_string()
 }
 
+/// Build the `AND column = ?` clause shared by a log list query and its COUNT,
+/// returning it with the values to bind in placeholder order
+pub fn log_filter_clause<'a>(filters: &[(&str, Option<&'a str>)]) -> (String, Vec<&'a str>) {
+    let mut clause = String::new();
+    let mut values = Vec::with_capacity(filters.len());
+    for (column, value) in filters {
+        if let Some(value) = value {
+            clause.push_str(" AND ");
+            clause.push_str(column);
+            clause.push_str(" = ?");
+            values.push(*value);
+        }
+    }
+    (clause, values)
+}
+
+/// Ordering and paging suffix for log lists: seek by id when a cursor is
+/// given (binds id, limit), otherwise LIMIT/OFFSET (binds limit, offset)
+pub fn log_page_clause(before_id: Option<i64>) -> &'static str {
+    if before_id.is_some() {
+        " AND id < ? ORDER BY id DESC LIMIT ?"
+    } else {
+        " ORDER BY id DESC LIMIT ? OFFSET ?"
+    }
+}
+
+/// How long a log list total is reused before COUNT(*) runs again
+const LOG_COUNT_TTL: Duration = Duration::from_secs(5);
+
+type LogCountCache = RwLock<HashMap<(&'static str, String), (Instant, i64)>>;
+
+/// Log list totals per (table, filter values).
+/// COUNT(*) has to walk the whole table or index, and the list refreshes on
+/// every page view, so a total may lag new inserts by up to LOG_COUNT_TTL;
+/// clearing a table drops its entries (see [`invalidate_log_count`]).
+fn log_count_cache() -> &'static LogCountCache {
+    static CACHE: OnceLock<LogCountCache> = OnceLock::new();
+    CACHE.get_or_init(|| RwLock::new(HashMap::new()))
+}
+
+/// Bumped on every invalidation so a COUNT that raced with a clear is not cached
+static LOG_COUNT_GENERATION: AtomicU64 = AtomicU64::new(0);
+
+/// Drop cached totals of a log table; call after deleting its rows
+pub fn invalidate_log_count(table: &str) {
+    LOG_COUNT_GENERATION.fetch_add(1, Ordering::SeqCst);
+    if let Ok(mut cache) = log_count_cache().write() {
+        cache.retain(|(cached_table, _), _| *cached_table != table);
+    }
+}
+
+/// `SELECT COUNT(*) FROM table WHERE 1=1{filter_sql}`, cached for LOG_COUNT_TTL
+/// per filter tuple; `filter_sql` / `filter_values` come from [`log_filter_clause`]
+pub async fn cached_log_count(
+    pool: &SqlitePool,
+    table: &'static str,
+    filter_sql: &str,
+    filter_values: &[&str],
+) -> Result<i64, sqlx::Error> {
+    // filter_sql 已包含列名，值用 \0 分隔，不同过滤组合不会冲突
+    let key = (table, format!("{}\0{}", filter_sql, filter_values.join("\0")));
+    if let Some(total) = log_count_cache()
+        .read()
+        .ok()
+        .and_then(|cache| cache.get(&key).copied())
+        .filter(|(at, _)| at.elapsed() < LOG_COUNT_TTL)
+        .map(|(_, total)| total)
+    {
+        return Ok(total);
+    }
+
+    let generation = LOG_COUNT_GENERATION.load(Ordering::SeqCst);
+
+    let count_sql = format!("SELECT COUNT(*) FROM {} WHERE 1=1{}", table, filter_sql);
+    let mut q = sqlx::query_as::<_, (i64,)>(&count_sql);
+    for value in filter_values {
+        q = q.bind(*value);
+    }
+    let (total,) = q.fetch_one(pool).await?;
+
+    if let Ok(mut cache) = log_count_cache().write() {
+        if LOG_COUNT_GENERATION.load(Ordering::SeqCst) == generation {
+            // 顺带清掉过期项，缓存大小不超过近期出现过的过滤组合数
+            cache.retain(|_, (at, _)| at.elapsed() < LOG_COUNT_TTL);
+            cache.insert(key, (Instant::now(), total));
+        }
+    }
+
+    Ok(total)
+}